@@ -0,0 +1,386 @@
+# Benchmark how building and rendering the reference scenes scales
+#
+# Builds the Louisville view (from foothills/Louisville_view.json, but with a
+#  synthetic DEM and textures, so no external data is needed) and the
+#  quickstart plane+ball scene, at a range of terrain and render resolutions.
+#  Each is rendered with a fixed, low-sample, Cycles preset, and the build time,
+#  render time, peak memory and triangle count are appended to a results file
+#  (one JSON record per line), so runs can be compared.
+#
+# The synthetic files are made once, in a separate process, and shared by all
+#  the cases. Each case then runs in a separate process, so its peak memory is
+#  for that case alone. The memory in use just before the build is recorded as
+#  'baseline_memory', and 'peak_memory' is the peak above that - the memory used
+#  by building and rendering the scene.
+#
+# Run the whole set (with bpy installed as a python module):
+#   python benchmarks/scene_scaling.py --output scene_scaling.jsonl
+# or with a Blender executable:
+#   python benchmarks/scene_scaling.py --blender blender --output scene_scaling.jsonl
+#
+# (PYTHONPATH must include the project root, as for the other scripts.)
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import tempfile
+
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Height colouring for the synthetic terrain texture: green, brown, grey, white
+TERRAIN_COLOURS = [
+    [0.20, 0.40, 0.15],
+    [0.45, 0.35, 0.20],
+    [0.55, 0.55, 0.55],
+    [0.95, 0.95, 0.95],
+]
+
+
+def make_synthetic_dem(size=1024, seed=0):
+    """
+    Makes a synthetic DEM - a ridge, with random hills - scaled to 0-1.
+
+    Parameters:
+    - size (int): The width and height of the DEM.
+    - seed (int): The random seed (the same seed gives the same DEM).
+
+    Returns:
+    - numpy.ndarray: The heights, shape (size, size).
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0 : 1 : size * 1j, 0 : 1 : size * 1j]
+    heights = 0.3 * np.exp(-(((x - 0.3) / 0.15) ** 2))  # Mountains to the west
+    for _ in range(50):
+        cx, cy = rng.random(2)
+        width = rng.uniform(0.02, 0.1)
+        heights += rng.uniform(0.0, 0.1) * np.exp(
+            -((x - cx) ** 2 + (y - cy) ** 2) / width**2
+        )
+    return heights / heights.max()
+
+
+def make_synthetic_textures(size=2048, seed=0):
+    """
+    Makes synthetic terrain and backdrop textures.
+
+    Parameters:
+    - size (int): The width and height of the terrain texture (the backdrop is
+                  half the height).
+    - seed (int): The random seed.
+
+    Returns:
+    - dict: RGB arrays (values 0-1), by object name.
+    """
+    import numpy as np
+
+    # The terrain coloured by height
+    heights = make_synthetic_dem(size, seed=seed)
+    levels = np.linspace(0.0, 1.0, len(TERRAIN_COLOURS))
+    terrain = np.stack(
+        [
+            np.interp(heights, levels, channel)
+            for channel in np.transpose(TERRAIN_COLOURS)
+        ],
+        axis=2,
+    )
+    # A noisy grey gradient for the backdrop
+    rng = np.random.default_rng(seed)
+    gradient = np.linspace(0.9, 0.4, size // 2)[:, np.newaxis, np.newaxis]
+    backdrop = np.clip(gradient + rng.normal(0.0, 0.05, (size // 2, size, 3)), 0, 1)
+    return {"Terrain": terrain, "Backdrop": backdrop}
+
+
+def make_fixtures(fixtures_dir, dem_size=1024, texture_size=2048):
+    """
+    Writes the synthetic DEM and texture files, for the Louisville view.
+
+    Parameters:
+    - fixtures_dir (str): The directory to write them to.
+    - dem_size (int): The width and height of the DEM.
+    - texture_size (int): The width and height of the terrain texture.
+    """
+    from library.output import encode_exr, encode_png
+
+    with open(os.path.join(fixtures_dir, "synthetic_dem.exr"), "wb") as f:
+        f.write(encode_exr(make_synthetic_dem(dem_size)))
+    for name, texture in make_synthetic_textures(texture_size).items():
+        texture_file = os.path.join(fixtures_dir, "synthetic_%s.png" % name.lower())
+        with open(texture_file, "wb") as f:
+            f.write(encode_png(texture))
+
+
+def prepare_louisville(polygons, resolution, work_dir, fixtures_dir):
+    """
+    Makes the Louisville view spec, using the synthetic DEM and texture files.
+
+    Returns:
+    - dict: The spec.
+    """
+    from library.scene_spec import load_spec, update_spec
+
+    spec = load_spec(os.path.join(root, "foothills", "Louisville_view.json"))
+    spec = update_spec(
+        spec,
+        {
+            "render": {
+                "filename": os.path.join(work_dir, "Louisville"),
+                "resolution_x": resolution[0],
+                "resolution_y": resolution[1],
+            },
+            "terrain": {
+                "dem": os.path.join(fixtures_dir, "synthetic_dem.exr"),
+                "polygons": polygons,
+                "memory_budget": None,
+            },
+        },
+    )
+    # The spec's materials, with the synthetic images
+    for name in ("Terrain", "Backdrop"):
+        spec["materials"][name]["image"] = os.path.join(
+            fixtures_dir, "synthetic_%s.png" % name.lower()
+        )
+    return spec
+
+
+def build_louisville(spec, work_dir):
+    """
+    Builds the Louisville view from its spec.
+    """
+    from library.scene_spec import build_scene
+
+    build_scene(spec, base_dir=work_dir)
+
+
+def prepare_plane_ball(polygons, resolution, work_dir, fixtures_dir):
+    """
+    Nothing to prepare for the plane+ball scene (it has no terrain, so polygons
+    is ignored, and it uses no files).
+
+    Returns:
+    - tuple: The render resolution.
+    """
+    return resolution
+
+
+def build_plane_ball(resolution, work_dir):
+    """
+    Builds the quickstart plane+ball scene.
+    """
+    import runpy
+    import bpy
+
+    runpy.run_path(os.path.join(root, "quickstart", "plane+ball.py"))
+    bpy.context.scene.render.resolution_x = resolution[0]
+    bpy.context.scene.render.resolution_y = resolution[1]
+
+
+# For each scene: the function preparing its inputs (not timed), and the
+#  function building it (timed)
+SCENES = {
+    "louisville": (prepare_louisville, build_louisville),
+    "plane+ball": (prepare_plane_ball, build_plane_ball),
+}
+
+
+def set_render_preset(scene, samples):
+    """
+    Sets a fixed, quick, render preset - so results are comparable.
+    """
+    scene.render.engine = "CYCLES"
+    scene.cycles.device = "CPU"
+    scene.cycles.samples = samples
+    scene.cycles.use_denoising = False
+    scene.cycles.use_adaptive_sampling = False
+    scene.render.resolution_percentage = 100
+
+
+def count_triangles(scene):
+    """
+    Counts the triangles in the (evaluated) scene, without copying any meshes.
+    """
+    import bpy
+    import numpy as np
+
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    triangles = 0
+    for obj in scene.objects:
+        if obj.type != "MESH":
+            continue
+        polygons = obj.evaluated_get(depsgraph).data.polygons
+        loop_totals = np.empty(len(polygons), dtype=np.int32)
+        polygons.foreach_get("loop_total", loop_totals)
+        triangles += int(np.sum(loop_totals - 2))
+    return triangles
+
+
+def run_case(scene_name, polygons, resolution, samples, fixtures_dir):
+    """
+    Builds and renders one case, in this process.
+
+    Only building and rendering are timed - not preparing the inputs, or
+    counting the triangles (done after the render, so it doesn't add to the
+    peak memory either).
+
+    Returns:
+    - dict: The results.
+    """
+    import bpy
+    from library.utilities import get_current_memory, get_peak_memory
+
+    prepare, build = SCENES[scene_name]
+    with tempfile.TemporaryDirectory() as work_dir:
+        # plane+ball starts from the default scene, the others from an empty one
+        bpy.ops.wm.read_factory_settings(use_empty=scene_name != "plane+ball")
+        inputs = prepare(polygons, resolution, work_dir, fixtures_dir)
+        baseline_memory = get_current_memory()
+        start = time.perf_counter()
+        build(inputs, work_dir)
+        scene = bpy.context.scene
+        set_render_preset(scene, samples)
+        built = time.perf_counter()
+        bpy.ops.render.render(write_still=False)
+        rendered = time.perf_counter()
+        peak_memory = get_peak_memory()
+        triangles = count_triangles(scene)
+    if baseline_memory is not None and peak_memory is not None:
+        peak_memory -= baseline_memory
+    else:
+        peak_memory = None
+    return {
+        "scene": scene_name,
+        "polygons": polygons if scene_name != "plane+ball" else None,
+        "resolution": list(resolution),
+        "samples": samples,
+        "build_time": built - start,
+        "render_time": rendered - built,
+        "baseline_memory": baseline_memory,
+        "peak_memory": peak_memory,
+        "triangles": triangles,
+        "blender_version": bpy.app.version_string,
+    }
+
+
+def _run_script(args, script_args, env):
+    # Runs this script in a new process (with bpy, or in Blender)
+    script = os.path.abspath(__file__)
+    if args.blender is None:
+        command = [sys.executable, script] + script_args
+    else:
+        command = [args.blender, "--background", "--python", script, "--"]
+        command += script_args
+    subprocess.run(command, env=env, check=True)
+
+
+def run_all(args):
+    """
+    Makes the synthetic files, then runs every case, each in its own process,
+    and appends the results to a file.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (root, env.get("PYTHONPATH")) if p)
+    cases = []
+    for resolution in args.resolutions:
+        for polygons in args.polygons:
+            cases.append(("louisville", polygons, resolution))
+        cases.append(("plane+ball", 0, resolution))
+
+    with tempfile.TemporaryDirectory() as fixtures_dir:
+        print("Making the synthetic files")
+        _run_script(
+            args,
+            [
+                "--make_fixtures",
+                "--fixtures",
+                fixtures_dir,
+                "--dem_size",
+                str(args.dem_size),
+                "--texture_size",
+                str(args.texture_size),
+            ],
+            env,
+        )
+        for scene_name, polygons, resolution in cases:
+            print(
+                "Running %s, %d polygons, %dx%d" % ((scene_name, polygons) + resolution)
+            )
+            _run_script(
+                args,
+                [
+                    "--case",
+                    scene_name,
+                    "--polygons",
+                    str(polygons),
+                    "--resolutions",
+                    "%dx%d" % tuple(resolution),
+                    "--samples",
+                    str(args.samples),
+                    "--fixtures",
+                    fixtures_dir,
+                    "--output",
+                    args.output,
+                ],
+                env,
+            )
+
+
+def resolution_type(text):
+    return tuple(int(size) for size in text.split("x"))
+
+
+if __name__ == "__main__":
+    # Blender passes the arguments after '--' on to the script
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else sys.argv[1:]
+    parser = argparse.ArgumentParser(description="Benchmark scene build and render")
+    parser.add_argument(
+        "--output", help="Results file", type=str, default="scene_scaling.jsonl"
+    )
+    parser.add_argument(
+        "--blender", help="Blender executable (default: use bpy module)", default=None
+    )
+    parser.add_argument(
+        "--polygons",
+        help="Terrain polygons per side",
+        type=int,
+        nargs="+",
+        default=[250, 500, 1000],
+    )
+    parser.add_argument(
+        "--resolutions",
+        help="Render resolutions (e.g. 480x270)",
+        type=resolution_type,
+        nargs="+",
+        default=[(480, 270), (960, 540)],
+    )
+    parser.add_argument("--samples", help="Render samples", type=int, default=4)
+    parser.add_argument("--dem_size", help="Synthetic DEM size", type=int, default=1024)
+    parser.add_argument(
+        "--texture_size", help="Synthetic texture size", type=int, default=2048
+    )
+    parser.add_argument("--case", help=argparse.SUPPRESS, default=None)
+    parser.add_argument("--fixtures", help=argparse.SUPPRESS, default=None)
+    parser.add_argument("--make_fixtures", help=argparse.SUPPRESS, action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.make_fixtures:
+        make_fixtures(args.fixtures, args.dem_size, args.texture_size)
+    elif args.case is None:
+        run_all(args)
+    else:
+        result = run_case(
+            args.case,
+            args.polygons[0],
+            args.resolutions[0],
+            args.samples,
+            args.fixtures,
+        )
+        result["host"] = socket.gethostname()
+        result["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(args.output, "a") as f:
+            f.write(json.dumps(result) + "\n")
+        print(json.dumps(result))
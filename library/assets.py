@@ -0,0 +1,160 @@
+# Load image and raster files in the background, while the scene is being built
+#
+# Blender can only be used from the main thread, but decoding files into numpy
+#  arrays doesn't need Blender. So the files are decoded on a pool of threads,
+#  and the Blender images are made (on the main thread) when they are needed.
+#  Build time then approaches the longest single step, not the sum of them all.
+#
+# Decoding needs Pillow. Without it, images are loaded by Blender, on the main
+#  thread, as usual.
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from library.constructors.images import load_image, is_image_cached
+
+# The Pillow image modes that can be used as they are (8 bits per channel)
+PIL_MODES = ("L", "LA", "RGB", "RGBA")
+
+# The Pillow image modes with more than 8 bits per channel (and "I;16", etc.),
+#  left to Blender
+PIL_DEEP_MODES = ("I", "F")
+
+
+def _is_deep(img):
+    # Whether a Pillow image has more than 8 bits per channel - Pillow opens some
+    #  (e.g. 16-bit RGB PNGs) in 8-bit modes, so the file's raw mode is checked too
+    if img.mode in PIL_DEEP_MODES or img.mode.startswith("I;"):
+        return True
+    for tile in img.tile:
+        rawmode = tile[3]
+        if isinstance(rawmode, tuple):
+            rawmode = rawmode[0] if rawmode else ""
+        if isinstance(rawmode, str) and ("16" in rawmode or "32" in rawmode):
+            return True
+    return False
+
+
+def decode_image_file(path):
+    """
+    Decodes an 8-bit image file into a numpy array, without using Blender.
+
+    The array matches what Blender would load: RGBA, row 0 at the bottom, and
+    pixel values scaled to 0-1.
+
+    Images with more than 8 bits per channel (e.g. 16-bit or float DEMs) are left
+    to Blender: how it scales them, and which colour space it gives them, depends
+    on the file's bit depth and sample format, not just its pixel values.
+
+    Parameters:
+    - path (str): The image file.
+
+    Returns:
+    - numpy.ndarray: The (height, width, 4) float32 array. None if the file can't
+                     be decoded (no decoder installed, more than 8 bits per
+                     channel, or an unsupported format).
+    """
+    try:
+        from PIL import Image
+
+        with Image.open(path) as img:
+            if _is_deep(img):
+                return None
+            if img.mode not in PIL_MODES:
+                # Palette, CMYK, 1-bit, etc. - to colours
+                img = img.convert("RGBA")
+            raw = np.asarray(img)
+    except (ImportError, OSError):
+        return None
+    arr = raw.astype(np.float32) / 255.0
+
+    # To RGBA, with row 0 at the bottom
+    if arr.ndim == 2:
+        arr = arr[:, :, np.newaxis]
+    if arr.shape[2] < 3:  # Grey, or grey + alpha
+        arr = np.concatenate((np.repeat(arr[:, :, :1], 3, axis=2), arr[:, :, 1:]), 2)
+    if arr.shape[2] == 3:
+        arr = np.dstack((arr, np.ones(arr.shape[:2], dtype=np.float32)))
+    return np.ascontiguousarray(arr[::-1])
+
+
+def read_image_size(path):
+    """
+    Reads the size of an image file from its header, without decoding it.
+
+    Parameters:
+    - path (str): The image file.
+
+    Returns:
+    - tuple: (width, height, is_float) - is_float if the image has more than 8
+             bits per channel (so Blender stores it as floats). None if the file
+             can't be read (no Pillow installed, or an unsupported format).
+    """
+    try:
+        from PIL import Image
+
+        with Image.open(path) as img:
+            return img.size[0], img.size[1], _is_deep(img)
+    except (ImportError, OSError):
+        return None
+
+
+class AssetLoader:
+    """
+    Decodes image files on background threads, for use in Blender later.
+
+    Request files as early as possible, then get the images when needed:
+
+        loader = AssetLoader()
+        loader.request(dem_file, texture_file)
+        ...  # build geometry
+        img = loader.image(texture_file)
+    """
+
+    def __init__(self, max_workers=4):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = {}
+
+    def request(self, *paths):
+        """
+        Starts decoding files in the background (if not already started or cached).
+        """
+        for path in paths:
+            path = os.path.abspath(path)
+            if path not in self.futures and not is_image_cached(path):
+                self.futures[path] = self.executor.submit(decode_image_file, path)
+
+    def image(self, path):
+        """
+        Gets a file as a Blender image (must be called from the main thread).
+
+        Waits for the file to be decoded, if it was requested and isn't ready yet.
+        Files not requested, or that can't be decoded, are loaded by Blender.
+
+        Parameters:
+        - path (str): The image file.
+
+        Returns:
+        - bpy.types.Image: The image.
+        """
+        path = os.path.abspath(path)
+        future = self.futures.pop(path, None)
+        if future is not None:
+            arr = future.result()
+            if arr is not None:
+                return load_image(path, decoded=(arr, False, "sRGB"))
+        return load_image(path)
+
+    def shutdown(self):
+        """
+        Stops the background threads (abandoning any files not yet decoded).
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.futures = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
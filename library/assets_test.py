@@ -0,0 +1,148 @@
+import unittest
+import os
+import tempfile
+import bpy
+import numpy as np
+
+from library.constructors.images import (
+    make_image_from_numpy,
+    make_numpy_from_image,
+    clear_image_cache,
+    set_image_caching,
+)
+from library.assets import decode_image_file, read_image_size, AssetLoader
+
+try:
+    import PIL
+except ImportError:
+    PIL = None
+
+
+class TestAssetLoader(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test, and save an image file to load
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        clear_image_cache()
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.png")
+        arr = np.random.rand(4, 6, 4).astype(np.float32)
+        arr[:, :, 3] = 1.0
+        img = make_image_from_numpy(arr, name="test_image")
+        img.filepath_raw = self.path
+        img.file_format = "PNG"
+        img.save()
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    def tearDown(self):
+        set_image_caching(False)
+        self.directory.cleanup()
+
+    @unittest.skipIf(PIL is None, "Needs Pillow")
+    def test_decode_matches_blender(self):
+        """
+        Test that a decoded file has the same pixels as the file loaded by Blender.
+        """
+        arr = decode_image_file(self.path)
+        expected = make_numpy_from_image(bpy.data.images.load(self.path))
+        np.testing.assert_array_almost_equal(arr, expected, decimal=3)
+
+    @unittest.skipIf(PIL is None, "Needs Pillow")
+    def test_decode_palette(self):
+        """
+        Test that a palette image is decoded to its colours, as Blender loads it.
+        """
+        from PIL import Image
+
+        path = os.path.join(self.directory.name, "palette.png")
+        palette = Image.new("P", (6, 4))
+        palette.putpalette([255, 0, 0, 0, 255, 0] + [0] * 762)
+        palette.putdata([0, 1] * 12)
+        palette.save(path)
+        arr = decode_image_file(path)
+        np.testing.assert_array_almost_equal(arr[0, 0], (1.0, 0.0, 0.0, 1.0))
+        np.testing.assert_array_almost_equal(arr[0, 1], (0.0, 1.0, 0.0, 1.0))
+        expected = make_numpy_from_image(bpy.data.images.load(path))
+        np.testing.assert_array_almost_equal(arr, expected, decimal=3)
+
+    @unittest.skipIf(PIL is None, "Needs Pillow")
+    def test_decode_int16(self):
+        """
+        Test that a 16-bit raster is left to Blender, and loads as Blender loads it.
+        """
+        from PIL import Image
+
+        path = os.path.join(self.directory.name, "heights.tif")
+        heights = np.array([[0, 1000, 2000], [20000, 30000, 32767]], dtype=np.int16)
+        Image.fromarray(heights).save(path)
+        self.assertIsNone(decode_image_file(path))
+        with AssetLoader() as loader:
+            loader.request(path)
+            img = loader.image(path)
+        expected = bpy.data.images.load(path)
+        self.assertEqual(
+            img.colorspace_settings.name, expected.colorspace_settings.name
+        )
+        np.testing.assert_array_almost_equal(
+            make_numpy_from_image(img), make_numpy_from_image(expected)
+        )
+
+    def test_decode_rgb16(self):
+        """
+        Test that a 16-bit colour PNG (opened by Pillow as 8-bit) is left to Blender.
+        """
+        path = os.path.join(self.directory.name, "colour16.png")
+        img = make_image_from_numpy(np.random.rand(4, 6, 3), name="colour16")
+        scene = bpy.context.scene
+        scene.render.image_settings.file_format = "PNG"
+        scene.render.image_settings.color_mode = "RGB"
+        scene.render.image_settings.color_depth = "16"
+        img.save_render(path, scene=scene)
+        self.assertIsNone(decode_image_file(path))
+
+    @unittest.skipIf(PIL is None, "Needs Pillow")
+    def test_read_image_size(self):
+        """
+        Test that the size read from the header matches the loaded image.
+        """
+        img = bpy.data.images.load(self.path)
+        self.assertEqual(
+            read_image_size(self.path), (img.size[0], img.size[1], img.is_float)
+        )
+
+    def test_decode_unsupported(self):
+        """
+        Test that a file that can't be decoded gives None.
+        """
+        path = os.path.join(self.directory.name, "test.txt")
+        with open(path, "w") as f:
+            f.write("Not an image")
+        self.assertIsNone(decode_image_file(path))
+        self.assertIsNone(read_image_size(path))
+
+    def test_loader_image(self):
+        """
+        Test that the loader makes the same image, whether requested or not.
+        """
+        expected = make_numpy_from_image(bpy.data.images.load(self.path))
+        with AssetLoader() as loader:
+            loader.request(self.path)
+            img = loader.image(self.path)
+            self.assertEqual(tuple(img.size), (6, 4))
+            np.testing.assert_array_almost_equal(
+                make_numpy_from_image(img), expected, decimal=3
+            )
+
+    def test_loader_cache(self):
+        """
+        Test that a file already loaded isn't decoded again, with caching on.
+        """
+        set_image_caching(True)
+        with AssetLoader() as loader:
+            loader.request(self.path)
+            loader.image(self.path)
+            loader.request(self.path)
+            self.assertEqual(loader.futures, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
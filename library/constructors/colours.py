@@ -0,0 +1,175 @@
+# Utility functions to colour meshes from data arrays
+
+import bpy
+import numpy as np
+
+from library.utilities import sample_grid, get_vertex_coordinates, get_xy_bounds
+
+
+def get_colour_lookup(cmap, n_colours=256):
+    """
+    Make an RGBA lookup table from a colormap.
+
+    Parameters:
+    - cmap: The colormap. Can be the name of a cmocean or matplotlib colormap
+            (e.g. 'deep', 'viridis'), a colormap object (callable on values in [0,1]),
+            or an array of colours with shape (n, 3) or (n, 4).
+    - n_colours (int): The number of entries to sample from a colormap object.
+
+    Returns:
+    - numpy.ndarray: The lookup table, shape (n, 4), float32.
+    """
+    if isinstance(cmap, str):
+        cmap = _named_colormap(cmap)
+    if callable(cmap):
+        lut = np.asarray(cmap(np.linspace(0.0, 1.0, n_colours)), dtype=np.float32)
+    else:
+        lut = np.asarray(cmap, dtype=np.float32)
+    if lut.ndim != 2 or lut.shape[1] not in (3, 4) or lut.shape[0] < 2:
+        raise ValueError("Colour lookup must have shape (n, 3) or (n, 4), n>1")
+    if lut.shape[1] == 3:
+        lut = np.hstack((lut, np.ones((lut.shape[0], 1), dtype=np.float32)))
+    return lut
+
+
+def _named_colormap(name):
+    # cmocean is the preferred source, fall back to matplotlib
+    try:
+        import cmocean
+
+        if name in cmocean.cm.cmap_d:
+            return cmocean.cm.cmap_d[name]
+    except ImportError:
+        pass
+    try:
+        import matplotlib
+
+        return matplotlib.colormaps[name]
+    except ImportError:
+        raise ImportError("Named colormaps need cmocean or matplotlib installed")
+
+
+def map_to_colours(
+    values,
+    cmap,
+    vmin=None,
+    vmax=None,
+    n_colours=256,
+    nan_colour=(0.5, 0.5, 0.5, 1.0),
+    linear=True,
+):
+    """
+    Map an array of values to RGBA colours through a colormap.
+
+    Parameters:
+    - values (numpy.ndarray): The data values (any shape).
+    - cmap: The colormap - see get_colour_lookup.
+    - vmin (float): The value mapped to the bottom of the colormap (default: data min).
+    - vmax (float): The value mapped to the top of the colormap (default: data max).
+    - n_colours (int): The number of entries to sample from a colormap object.
+    - nan_colour (tuple): The RGBA colour to use for NaN values (used as it is,
+                          not converted to linear).
+    - linear (bool): If True, convert the colormap's colours from sRGB to
+                     linear, as Blender expects for colour attributes.
+
+    Returns:
+    - numpy.ndarray: The colours, shape values.shape+(4,), float32.
+    """
+    values = np.asarray(values, dtype=np.float32)
+    shape = values.shape
+    values = np.atleast_1d(values)
+    lut = get_colour_lookup(cmap, n_colours)
+    if vmin is None:
+        vmin = np.nanmin(values)
+    if vmax is None:
+        vmax = np.nanmax(values)
+    scale = (vmax - vmin) if vmax > vmin else 1.0
+
+    # Linear interpolation between lookup table entries
+    position = np.clip((values - vmin) / scale, 0.0, 1.0) * (lut.shape[0] - 1)
+    missing = np.isnan(position)
+    position[missing] = 0.0
+    lower = np.minimum(position.astype(np.int32), lut.shape[0] - 2)
+    weight = (position - lower)[..., np.newaxis]
+    colours = lut[lower] * (1.0 - weight) + lut[lower + 1] * weight
+
+    if linear:
+        colours[..., :3] = srgb_to_linear(colours[..., :3])
+    colours[missing] = nan_colour
+    return colours.reshape(shape + (4,))
+
+
+def srgb_to_linear(rgb):
+    """
+    Convert sRGB colour components to linear.
+
+    Parameters:
+    - rgb (numpy.ndarray): The sRGB values, in the range 0-1.
+
+    Returns:
+    - numpy.ndarray: The linear values.
+    """
+    rgb = np.asarray(rgb, dtype=np.float32)
+    return np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+
+
+def linear_to_srgb(rgb):
+    """
+    Convert linear colour components to sRGB.
+
+    Parameters:
+    - rgb (numpy.ndarray): The linear values.
+
+    Returns:
+    - numpy.ndarray: The sRGB values, clipped to the range 0-1.
+    """
+    rgb = np.clip(np.asarray(rgb, dtype=np.float32), 0.0, 1.0)
+    return np.where(rgb <= 0.0031308, rgb * 12.92, 1.055 * rgb ** (1.0 / 2.4) - 0.055)
+
+
+def sample_grid_at_vertices(mesh, arr):
+    """
+    Sample a data array at each vertex of a grid mesh.
+
+    The array is treated like an image texture UV-mapped onto the grid: column 0
+    is at the minimum x of the mesh, and row 0 at the minimum y (the same
+    orientation as make_numpy_from_image).
+
+    Parameters:
+    - mesh (bpy.types.Mesh): The mesh (e.g. the data of an object made by new_grid).
+    - arr (numpy.ndarray): The 2D data array.
+
+    Returns:
+    - numpy.ndarray: The data value at each vertex, shape (len(mesh.vertices),).
+    """
+    co = get_vertex_coordinates(mesh)
+    lower, extent = get_xy_bounds(co)
+    uv = (co[:, :2] - lower) / extent
+    return sample_grid(arr, uv[:, 0], uv[:, 1])
+
+
+def set_vertex_colours(obj, colours, name="Colour"):
+    """
+    Write per-vertex colours into a colour attribute on a mesh object.
+
+    Parameters:
+    - obj (bpy.types.Object): The mesh object.
+    - colours (numpy.ndarray): The linear RGBA colours, shape (n_vertices, 4).
+    - name (str): The name of the colour attribute (replaced if it exists).
+
+    Returns:
+    - bpy.types.Attribute: The colour attribute.
+    """
+    mesh = obj.data
+    colours = np.ascontiguousarray(colours, dtype=np.float32).reshape((-1, 4))
+    if colours.shape[0] != len(mesh.vertices):
+        raise ValueError(
+            "Got %d colours for %d vertices" % (colours.shape[0], len(mesh.vertices))
+        )
+    if name in mesh.color_attributes:
+        mesh.color_attributes.remove(mesh.color_attributes[name])
+    attribute = mesh.color_attributes.new(name=name, type="FLOAT_COLOR", domain="POINT")
+    attribute.data.foreach_set("color", colours.ravel())
+    mesh.color_attributes.active_color = attribute
+    mesh.update()
+    return attribute
@@ -0,0 +1,109 @@
+import unittest
+import bpy
+import numpy as np
+
+from library.constructors.meshes import new_grid
+from library.constructors.colours import (
+    get_colour_lookup,
+    map_to_colours,
+    sample_grid_at_vertices,
+    set_vertex_colours,
+)
+
+
+class TestMapToColours(unittest.TestCase):
+    def test_lookup_from_rgb_array(self):
+        """
+        Test that an RGB lookup table gets an opaque alpha channel.
+        """
+        lut = get_colour_lookup([[0, 0, 0], [1, 1, 1]])
+        self.assertEqual(lut.shape, (2, 4))
+        np.testing.assert_array_equal(lut[:, 3], [1, 1])
+
+    def test_interpolation(self):
+        """
+        Test that values are linearly interpolated through the lookup table.
+        """
+        lut = [[0, 0, 0, 1], [1, 0, 0, 1], [1, 1, 0, 1]]
+        colours = map_to_colours(
+            np.array([0.0, 0.25, 1.0, 2.0]), lut, vmin=0, vmax=1, linear=False
+        )
+        self.assertEqual(colours.shape, (4, 4))
+        np.testing.assert_array_almost_equal(colours[0], [0, 0, 0, 1])
+        np.testing.assert_array_almost_equal(colours[1], [0.5, 0, 0, 1])
+        np.testing.assert_array_almost_equal(colours[2], [1, 1, 0, 1])
+        # Out of range values are clipped
+        np.testing.assert_array_almost_equal(colours[3], [1, 1, 0, 1])
+
+    def test_nan_colour(self):
+        """
+        Test that NaN values get the nan_colour.
+        """
+        colours = map_to_colours(
+            np.array([[0.0, np.nan]]),
+            [[0, 0, 0], [1, 1, 1]],
+            vmin=0,
+            vmax=1,
+            nan_colour=(0, 0, 1, 0),
+        )
+        self.assertEqual(colours.shape, (1, 2, 4))
+        np.testing.assert_array_equal(colours[0, 1], [0, 0, 1, 0])
+        # Not converted to linear
+        colours = map_to_colours(
+            np.array([np.nan]), [[0, 0, 0], [1, 1, 1]], vmin=0, vmax=1
+        )
+        np.testing.assert_array_almost_equal(colours[0], [0.5, 0.5, 0.5, 1.0])
+
+    def test_single_value(self):
+        """
+        Test that a single (0-d) value gets a single colour.
+        """
+        colours = map_to_colours(
+            0.5, [[0, 0, 0], [1, 1, 1]], vmin=0, vmax=1, linear=False
+        )
+        self.assertEqual(colours.shape, (4,))
+        np.testing.assert_array_almost_equal(colours, [0.5, 0.5, 0.5, 1])
+
+
+class TestVertexColours(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    def test_sample_grid_at_vertices(self):
+        """
+        Test that a grid is sampled with x along columns and y along rows.
+        """
+        grid = new_grid(location=(0, 0, 0), size=2, name="TestGrid", xres=4, yres=4)
+        arr = np.array([[0.0, 1.0], [2.0, 3.0]])
+        values = sample_grid_at_vertices(grid.data, arr)
+        self.assertEqual(len(values), len(grid.data.vertices))
+        corner = [v.index for v in grid.data.vertices if v.co.x < 0 and v.co.y < 0]
+        opposite = [v.index for v in grid.data.vertices if v.co.x > 0 and v.co.y > 0]
+        self.assertAlmostEqual(values[corner[0]], 0.0)
+        self.assertAlmostEqual(values[opposite[-1]], 3.0)
+
+    def test_set_vertex_colours(self):
+        """
+        Test that colours are written into a per-vertex colour attribute.
+        """
+        grid = new_grid(location=(0, 0, 0), size=2, name="TestGrid", xres=2, yres=2)
+        colours = np.random.rand(len(grid.data.vertices), 4).astype(np.float32)
+        attribute = set_vertex_colours(grid, colours, name="Height")
+        self.assertEqual(attribute.domain, "POINT")
+        self.assertEqual(attribute.data_type, "FLOAT_COLOR")
+        result = np.empty(colours.size, dtype=np.float32)
+        attribute.data.foreach_get("color", result)
+        np.testing.assert_array_almost_equal(result, colours.ravel())
+
+    def test_set_vertex_colours_wrong_size(self):
+        """
+        Test that a colour array of the wrong length is rejected.
+        """
+        grid = new_grid(location=(0, 0, 0), size=2, name="TestGrid", xres=2, yres=2)
+        with self.assertRaises(ValueError):
+            set_vertex_colours(grid, np.zeros((3, 4)))
+
+
+if __name__ == "__main__":
+    unittest.main()
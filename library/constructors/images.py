@@ -1,10 +1,22 @@
 # Utility functions to make Images
 
+import os
 import bpy
 import numpy as np
 
+# Images loaded by load_image, kept so they can be re-used without re-reading
+#  the file (e.g. by the worker, which keeps them when it resets the scene).
+#  Off by default, as the images are kept even when nothing uses them. By path,
+#  with the file's modification time, and the image's name and size - so a
+#  changed file is loaded again, and an image since removed or scaled isn't
+#  re-used.
+_IMAGE_CACHE = {}
+# Custom property recording which file a kept image was loaded from
+_CACHE_PROPERTY = "image_cache_file"
+_CACHE_ENABLED = False
 
-def make_image_from_numpy(arr, name="img", rescale=False):
+
+def make_image_from_numpy(arr, name="img", rescale=False, float_buffer=False):
     """
     Create a new image texture from a numpy array.
 
@@ -12,11 +24,29 @@ def make_image_from_numpy(arr, name="img", rescale=False):
     - arr (numpy.ndarray): The numpy array to use for the texture.
     - name (str): The name of the image.
     - rescale (bool): If True, rescale the array to be between 0 and 1.
+    - float_buffer (bool): If True, store the image as floats, not bytes.
 
     Returns:
     - bpy.types.Image: The created image texture.
     """
 
+    arr = _to_rgba(arr, rescale)
+
+    # Create a new image
+    img = bpy.data.images.new(
+        name=name,
+        width=arr.shape[1],
+        height=arr.shape[0],
+        float_buffer=float_buffer,
+    )
+
+    # Set the pixels of the image (in bulk)
+    img.pixels.foreach_set(arr.ravel())
+
+    return img
+
+
+def _to_rgba(arr, rescale=False):
     # Rescale the array to be between 0 and 1
     if rescale:
         arr = (arr - arr.min()) / (arr.max() - arr.min())
@@ -27,18 +57,133 @@ def make_image_from_numpy(arr, name="img", rescale=False):
     if arr.shape[2] == 3:
         alpha = np.ones((arr.shape[0], arr.shape[1]))
         arr = np.dstack((arr, alpha))
+    return np.ascontiguousarray(arr, dtype=np.float32)
 
-    # Create a new image
-    img = bpy.data.images.new(
-        name=name,
-        width=arr.shape[1],
-        height=arr.shape[0],
-    )
 
-    # Set the pixels of the image
-    img.pixels[:] = arr.flatten()
+def update_image_from_numpy(img, arr):
+    """
+    Replace the pixels of an existing image with a numpy array (in place).
 
-    return img
+    Parameters:
+    - img (bpy.types.Image): The image to update.
+    - arr (numpy.ndarray): The new pixels - same height and width as the image.
+    """
+    arr = _to_rgba(arr)
+    if (arr.shape[1], arr.shape[0]) != tuple(img.size):
+        raise ValueError(
+            "Array of shape %s does not fit image of size %s"
+            % (arr.shape, tuple(img.size))
+        )
+    img.pixels.foreach_set(arr.ravel())
+    # Tell Blender the pixels have changed (so they are re-uploaded)
+    img.update()
+
+
+class AnimatedImage:
+    """
+    An image whose pixels change with the frame, from a numpy time series.
+
+    The same image is updated in place for each frame, so there are no new
+    images, or material changes, per frame.
+    """
+
+    def __init__(
+        self,
+        series,
+        name="animated",
+        frame_start=1,
+        frame_step=1,
+        loop=False,
+        users=(),
+        rescale=False,
+        float_buffer=False,
+    ):
+        """
+        Parameters:
+        - series (numpy.ndarray): The time series, shape (n_times, height, width)
+                                  or (n_times, height, width, channels).
+        - name (str): The name of the image.
+        - frame_start (int): The frame showing the first time step.
+        - frame_step (int): The number of frames for each time step.
+        - loop (bool): If True, go back to the start after the last time step,
+                       otherwise stay on the last time step.
+        - users (list): Things to use the image, with an 'image' attribute (e.g.
+                        ShaderNodeTexImage nodes, or image textures).
+        - rescale (bool): If True, rescale the whole series to be between 0 and 1.
+        - float_buffer (bool): If True, store the image as floats, not bytes.
+        """
+        self.series = series
+        self.frame_start = frame_start
+        self.frame_step = frame_step
+        self.loop = loop
+        self.offset = 0.0
+        self.scale = 1.0
+        if rescale:
+            # The same scaling for every time step (none for a constant series)
+            self.offset = float(np.min(series))
+            value_range = float(np.max(series)) - self.offset
+            if value_range > 0:
+                self.scale = 1.0 / value_range
+        self.image = make_image_from_numpy(
+            self._time_step(0), name=name, float_buffer=float_buffer
+        )
+        self.current = 0
+        for user in users:
+            user.image = self.image
+
+    def _time_step(self, index):
+        if self.scale == 1.0 and self.offset == 0.0:
+            return self.series[index]
+        return (self.series[index] - self.offset) * self.scale
+
+    def index_for_frame(self, frame):
+        """
+        Gets the time step to show at a frame.
+        """
+        index = max(0, (frame - self.frame_start) // self.frame_step)
+        if self.loop:
+            return index % len(self.series)
+        return min(index, len(self.series) - 1)
+
+    def show(self, index):
+        """
+        Shows a time step (does nothing if it is already showing).
+        """
+        if index == self.current:
+            return
+        update_image_from_numpy(self.image, self._time_step(index))
+        self.current = index
+
+    def update_frame(self, scene, *args):
+        """
+        Shows the time step for the scene's current frame (a frame change handler).
+        """
+        self.show(self.index_for_frame(scene.frame_current))
+
+    def register(self, scene=None):
+        """
+        Updates the image automatically whenever the frame changes.
+
+        The image is then written by a handler while animations render, so this
+        locks the interface during renders (scene.render.use_lock_interface) -
+        otherwise the render may read the image while it is being changed.
+
+        Parameters:
+        - scene (bpy.types.Scene): The scene to be rendered (default: the
+                                   current scene).
+        """
+        if scene is None:
+            scene = bpy.context.scene
+        scene.render.use_lock_interface = True
+        if self.update_frame not in bpy.app.handlers.frame_change_pre:
+            bpy.app.handlers.frame_change_pre.append(self.update_frame)
+
+    def unregister(self):
+        """
+        Stops updating the image when the frame changes.
+        """
+        if self.update_frame in bpy.app.handlers.frame_change_pre:
+            bpy.app.handlers.frame_change_pre.remove(self.update_frame)
 
 
 def make_numpy_from_image(img):
@@ -55,10 +200,127 @@ def make_numpy_from_image(img):
     # Get the pixels of the texture
     pixels = img.pixels
 
-    # Create a numpy array from the pixels
-    arr = np.array(pixels[:])
+    # Create a numpy array from the pixels - in bulk if the pixels support it
+    if hasattr(pixels, "foreach_get"):
+        arr = np.empty(len(pixels), dtype=np.float32)
+        pixels.foreach_get(arr)
+    else:
+        arr = np.array(pixels[:], dtype=np.float32)
 
     # Reshape the array to be in RGBA format
     arr = arr.reshape((img.size[1], img.size[0], 4))
 
     return arr
+
+
+def set_image_caching(enabled=True):
+    """
+    Turn the keeping of images by load_image on or off.
+
+    Parameters:
+    - enabled (bool): If True, load_image keeps (and re-uses) the images it loads.
+    """
+    global _CACHE_ENABLED
+    _CACHE_ENABLED = enabled
+    if not enabled:
+        clear_image_cache()
+
+
+def load_image(path, cache=None, decoded=None):
+    """
+    Load an image file, re-using the image from an earlier load if possible.
+
+    With caching on (see set_image_caching), the first load of a file reads it
+    as usual, and the image is kept. Later loads (of the same, unchanged, file)
+    return that image, without reading the file again - as long as it hasn't
+    been removed or scaled since.
+
+    Parameters:
+    - path (str): The image file.
+    - cache (bool): Whether to use the cache (default: as set by set_image_caching).
+    - decoded (tuple): (array, is_float, colorspace) - the file's pixels, already
+                       decoded some other way (e.g. library.assets).
+
+    Returns:
+    - bpy.types.Image: The loaded image.
+    """
+    if cache is None:
+        cache = _CACHE_ENABLED
+    if cache:
+        img = _cached_image(path)
+        if img is not None:
+            return img
+    if decoded is None:
+        img = bpy.data.images.load(os.path.abspath(path))
+    else:
+        arr, is_float, colorspace = decoded
+        img = make_image_from_numpy(
+            arr, name=os.path.basename(path), float_buffer=is_float
+        )
+        img.colorspace_settings.name = colorspace
+    if cache:
+        add_to_image_cache(path, img)
+    return img
+
+
+def _cached_image(path):
+    # The image kept for a file, if it is still there, unchanged
+    path = os.path.abspath(path)
+    if path not in _IMAGE_CACHE:
+        return None
+    mtime, name, size = _IMAGE_CACHE[path]
+    img = bpy.data.images.get(name)
+    if (
+        img is None
+        or img.get(_CACHE_PROPERTY) != path
+        or tuple(img.size) != size
+        or mtime != os.path.getmtime(path)
+    ):
+        return None
+    return img
+
+
+def is_image_cached(path):
+    """
+    Check whether load_image has kept the image of a file.
+
+    Parameters:
+    - path (str): The image file.
+
+    Returns:
+    - bool: True if the image is kept (and neither it nor the file has changed).
+    """
+    return _cached_image(path) is not None
+
+
+def add_to_image_cache(path, img):
+    """
+    Give load_image the image of a file, loaded some other way.
+
+    Replaces any image kept from an earlier version of the file.
+
+    Parameters:
+    - path (str): The image file.
+    - img (bpy.types.Image): The image.
+    """
+    path = os.path.abspath(path)
+    img[_CACHE_PROPERTY] = path
+    _IMAGE_CACHE[path] = (os.path.getmtime(path), img.name, tuple(img.size))
+
+
+def cached_images():
+    """
+    Gets the images kept by load_image (those it would still re-use).
+
+    Returns:
+    - list: The images (bpy.types.Image).
+    """
+    kept = (_cached_image(path) for path in list(_IMAGE_CACHE))
+    return [img for img in kept if img is not None]
+
+
+def clear_image_cache():
+    """
+    Forget the images kept by load_image (they are left in Blender).
+    """
+    _IMAGE_CACHE.clear()
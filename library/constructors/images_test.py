@@ -1,7 +1,18 @@
 import unittest
+import os
+import tempfile
 import bpy
 import numpy as np
-from images import make_numpy_from_image, make_image_from_numpy
+import images
+from images import (
+    make_numpy_from_image,
+    make_image_from_numpy,
+    load_image,
+    set_image_caching,
+    is_image_cached,
+    update_image_from_numpy,
+    AnimatedImage,
+)
 
 
 class ImageMock:
@@ -75,6 +86,138 @@ class TestMakeImageFromNumpy(unittest.TestCase):
         # Additional verifications can go here, depending on what properties
         # the image is expected to have based on the numpy array
 
+    def test_float_buffer(self):
+        # Values outside 0-1 are kept in a float image
+        arr = np.full((2, 2), 5.0, dtype=np.float32)
+        img = make_image_from_numpy(arr, name="test_image", float_buffer=True)
+        self.assertTrue(img.is_float)
+        np.testing.assert_array_almost_equal(make_numpy_from_image(img)[:, :, 0], arr)
+
+
+class TestLoadImage(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test, and save an image file to load
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "test.png")
+        self.arr = np.random.rand(4, 4, 4).astype(np.float32)
+        img = make_image_from_numpy(self.arr, name="test_image")
+        img.filepath_raw = self.path
+        img.file_format = "PNG"
+        img.save()
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    def tearDown(self):
+        set_image_caching(False)
+        self.directory.cleanup()
+
+    def test_load_from_cache(self):
+        # A second load gives the same image, without reading the file
+        set_image_caching(True)
+        first = load_image(self.path)
+        self.assertEqual(load_image(self.path), first)
+        self.assertEqual(len(bpy.data.images), 1)
+        self.assertEqual(images.cached_images(), [first])
+
+    def test_cache_off_by_default(self):
+        load_image(self.path)
+        self.assertFalse(is_image_cached(self.path))
+        load_image(self.path)
+        self.assertEqual(len(bpy.data.images), 2)
+
+    def test_changed_file(self):
+        # A changed file is loaded again, and replaces its old image in the cache
+        set_image_caching(True)
+        first = load_image(self.path)
+        os.utime(self.path, (0, 0))
+        self.assertFalse(is_image_cached(self.path))
+        self.assertNotEqual(load_image(self.path), first)
+        self.assertTrue(is_image_cached(self.path))
+        self.assertEqual(len(images._IMAGE_CACHE), 1)
+
+    def test_scaled_image(self):
+        # An image scaled since it was loaded isn't re-used, nor one removed
+        set_image_caching(True)
+        first = load_image(self.path)
+        first.scale(2, 2)
+        self.assertFalse(is_image_cached(self.path))
+        second = load_image(self.path)
+        self.assertEqual(tuple(second.size), (4, 4))
+        bpy.data.images.remove(second)
+        self.assertFalse(is_image_cached(self.path))
+        self.assertEqual(images.cached_images(), [])
+
+
+class TestUpdateImageFromNumpy(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    def test_update_in_place(self):
+        img = make_image_from_numpy(np.zeros((4, 4)), name="test_image")
+        arr = np.random.rand(4, 4, 4).astype(np.float32)
+        update_image_from_numpy(img, arr)
+        self.assertEqual(len(bpy.data.images), 1)
+        np.testing.assert_array_almost_equal(make_numpy_from_image(img), arr, 2)
+
+    def test_wrong_size(self):
+        img = make_image_from_numpy(np.zeros((4, 4)), name="test_image")
+        with self.assertRaises(ValueError):
+            update_image_from_numpy(img, np.zeros((4, 5)))
+
+
+class TestAnimatedImage(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        # A time series where every pixel of time step i is i/10
+        self.series = np.arange(5)[:, None, None] * np.ones((5, 2, 3)) / 10
+
+    def test_frames(self):
+        animated = AnimatedImage(self.series, frame_start=1, frame_step=2)
+        self.assertEqual(animated.index_for_frame(0), 0)
+        self.assertEqual(animated.index_for_frame(4), 1)
+        self.assertEqual(animated.index_for_frame(100), 4)
+        animated.loop = True
+        self.assertEqual(animated.index_for_frame(11), 0)
+
+    def test_handler(self):
+        """
+        Test that the one image is updated when the frame changes.
+        """
+        animated = AnimatedImage(self.series, float_buffer=True)
+        animated.register()
+        self.assertTrue(bpy.context.scene.render.use_lock_interface)
+        bpy.context.scene.frame_set(3)
+        self.assertEqual(len(bpy.data.images), 1)
+        self.assertAlmostEqual(make_numpy_from_image(animated.image)[0, 0, 0], 0.2)
+        animated.unregister()
+        bpy.context.scene.frame_set(4)
+        self.assertAlmostEqual(make_numpy_from_image(animated.image)[0, 0, 0], 0.2)
+
+    def test_users(self):
+        """
+        Test that users are given the image once, and it is updated in place.
+        """
+        texture = bpy.data.textures.new(name="Test", type="IMAGE")
+        animated = AnimatedImage(self.series, users=[texture], float_buffer=True)
+        self.assertEqual(texture.image, animated.image)
+        animated.show(1)
+        self.assertEqual(texture.image, animated.image)
+        self.assertEqual(len(bpy.data.images), 1)
+        self.assertAlmostEqual(make_numpy_from_image(texture.image)[0, 0, 0], 0.1)
+
+    def test_rescale(self):
+        """
+        Test that the series is rescaled to 0-1, and a constant one is left as is.
+        """
+        animated = AnimatedImage(self.series, rescale=True, float_buffer=True)
+        animated.show(4)
+        self.assertAlmostEqual(make_numpy_from_image(animated.image)[0, 0, 0], 1.0)
+        constant = AnimatedImage(np.full((3, 2, 2), 0.5), rescale=True)
+        self.assertEqual(constant.scale, 1.0)
+        self.assertAlmostEqual(make_numpy_from_image(constant.image)[0, 0, 0], 0.0)
+
 
 if __name__ == "__main__":
     unittest.main()
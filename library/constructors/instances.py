@@ -0,0 +1,179 @@
+# Library functions for scattering many copies of an object in Blender
+#
+# Each copy is an instance made by a geometry nodes modifier on a point cloud,
+#  not a separate object, so adding more copies costs only a point and a few
+#  attribute values each.
+
+import bpy
+import numpy as np
+
+from library.utilities import sample_grid, get_vertex_coordinates, get_xy_bounds
+
+
+def surface_positions(terrain, u, v, offset=0.0):
+    """
+    Calculates world positions on the surface of a (displaced) grid.
+
+    The heights are those of the evaluated grid - with all its modifiers (e.g.
+    the terrain displacement, and the curvature dropoff) applied - interpolated
+    between the vertices. The modifiers should only move the vertices vertically.
+
+    Parameters:
+    - terrain (bpy.types.Object): The grid object (e.g. made by new_terrain).
+    - u (numpy.ndarray): The positions along the x-axis of the grid (0-1).
+    - v (numpy.ndarray): The positions along the y-axis of the grid (0-1).
+    - offset (float): Extra height to add above the surface.
+
+    Returns:
+    - numpy.ndarray: The world coordinates, shape (n, 3).
+    """
+    u = np.asarray(u, dtype=np.float32).ravel()
+    v = np.asarray(v, dtype=np.float32).ravel()
+    base = get_vertex_coordinates(terrain.data)
+    lower, extent = get_xy_bounds(base)
+    # Evaluating also brings the object matrix up to date
+    depsgraph = bpy.context.evaluated_depsgraph_get()
+    evaluated = terrain.evaluated_get(depsgraph)
+    surface = get_vertex_coordinates(evaluated.data)
+
+    # The surface heights as a 2D array, by vertex column and row
+    fractions = (base[:, :2] - lower) / extent
+    columns = np.count_nonzero(fractions[:, 1] < 1e-6)
+    rows = len(base) // max(columns, 1)
+    if len(surface) != len(base) or columns < 2 or columns * rows != len(base):
+        raise ValueError("%s is not a grid (after its modifiers)" % terrain.name)
+    heights = np.empty((rows, columns), dtype=np.float32)
+    heights[
+        np.rint(fractions[:, 1] * (rows - 1)).astype(np.int64),
+        np.rint(fractions[:, 0] * (columns - 1)).astype(np.int64),
+    ] = surface[:, 2]
+
+    local = np.empty((len(u), 4), dtype=np.float32)
+    local[:, 0] = lower[0] + u * extent[0]
+    local[:, 1] = lower[1] + v * extent[1]
+    # Vertices are at i/(n-1), sample_grid's pixel centres at (i+0.5)/n
+    local[:, 2] = (
+        sample_grid(
+            heights,
+            (u * (columns - 1) + 0.5) / columns,
+            (v * (rows - 1) + 0.5) / rows,
+        )
+        + offset
+    )
+    local[:, 3] = 1.0
+    matrix = np.array(evaluated.matrix_world, dtype=np.float32)
+    return (local @ matrix.T)[:, :3]
+
+
+def scatter_instances(
+    source, positions, name, rotations=None, scales=None, indices=None
+):
+    """
+    Scatters instances of an object or collection over a set of points.
+
+    Parameters:
+    - source (bpy.types.Object or bpy.types.Collection): The thing to instance.
+        If a collection, each of its child objects is a variant, chosen by indices.
+    - positions (numpy.ndarray): The world positions, shape (n, 3).
+    - name (str): The name of the scatter object.
+    - rotations (numpy.ndarray): Euler rotations (radians), shape (n, 3).
+    - scales (numpy.ndarray): The scales, shape (n,) or (n, 3).
+    - indices (numpy.ndarray): For a collection source, which child to use
+                               for each instance, shape (n,).
+
+    Returns:
+    - bpy.types.Object: The scatter object (a point cloud with an instancing modifier).
+    """
+    positions = np.asarray(positions, dtype=np.float32).reshape((-1, 3))
+    count = positions.shape[0]
+    if rotations is None:
+        rotations = np.zeros((count, 3), dtype=np.float32)
+    if scales is None:
+        scales = np.ones(count, dtype=np.float32)
+    scales = np.asarray(scales, dtype=np.float32)
+    if scales.ndim == 1:
+        scales = np.repeat(scales[:, np.newaxis], 3, axis=1)
+    if indices is None:
+        indices = np.zeros(count, dtype=np.int32)
+    for values in (rotations, scales, indices):
+        if len(values) != count:
+            raise ValueError("Got %d values for %d points" % (len(values), count))
+
+    mesh = bpy.data.meshes.new(name + "_points")
+    mesh.vertices.add(count)
+    mesh.vertices.foreach_set("co", positions.ravel())
+    _set_point_attribute(mesh, "instance_rotation", "FLOAT_VECTOR", rotations)
+    _set_point_attribute(mesh, "instance_scale", "FLOAT_VECTOR", scales)
+    _set_point_attribute(mesh, "instance_index", "INT", indices)
+    mesh.update()
+
+    scatter = bpy.data.objects.new(name, mesh)
+    bpy.context.collection.objects.link(scatter)
+    modifier = scatter.modifiers.new(name="Instances", type="NODES")
+    modifier.node_group = _new_instancing_node_group(name + "_instancing", source)
+    return scatter
+
+
+def _set_point_attribute(mesh, name, data_type, values):
+    if data_type == "INT":
+        values = np.asarray(values, dtype=np.int32)
+        key = "value"
+    else:
+        values = np.asarray(values, dtype=np.float32)
+        key = "vector"
+    attribute = mesh.attributes.new(name=name, type=data_type, domain="POINT")
+    attribute.data.foreach_set(key, np.ascontiguousarray(values).ravel())
+    return attribute
+
+
+def _new_instancing_node_group(name, source):
+    # Geometry nodes: Instance on Points, with the per-point transform
+    #  read from the named attributes set by scatter_instances
+    group = bpy.data.node_groups.new(name, "GeometryNodeTree")
+    group.interface.new_socket(
+        name="Geometry", in_out="INPUT", socket_type="NodeSocketGeometry"
+    )
+    group.interface.new_socket(
+        name="Geometry", in_out="OUTPUT", socket_type="NodeSocketGeometry"
+    )
+    nodes = group.nodes
+    links = group.links
+    group_input = nodes.new(type="NodeGroupInput")
+    group_output = nodes.new(type="NodeGroupOutput")
+    instancer = nodes.new(type="GeometryNodeInstanceOnPoints")
+
+    if isinstance(source, bpy.types.Collection):
+        source_node = nodes.new(type="GeometryNodeCollectionInfo")
+        source_node.inputs["Collection"].default_value = source
+        source_node.inputs["Separate Children"].default_value = True
+        source_node.inputs["Reset Children"].default_value = True
+        links.new(source_node.outputs["Instances"], instancer.inputs["Instance"])
+        instancer.inputs["Pick Instance"].default_value = True
+        links.new(
+            _named_attribute(nodes, "instance_index", "INT"),
+            instancer.inputs["Instance Index"],
+        )
+    else:
+        source_node = nodes.new(type="GeometryNodeObjectInfo")
+        source_node.inputs["Object"].default_value = source
+        source_node.inputs["As Instance"].default_value = True
+        links.new(source_node.outputs["Geometry"], instancer.inputs["Instance"])
+
+    links.new(
+        _named_attribute(nodes, "instance_rotation", "FLOAT_VECTOR"),
+        instancer.inputs["Rotation"],
+    )
+    links.new(
+        _named_attribute(nodes, "instance_scale", "FLOAT_VECTOR"),
+        instancer.inputs["Scale"],
+    )
+    links.new(group_input.outputs["Geometry"], instancer.inputs["Points"])
+    links.new(instancer.outputs["Instances"], group_output.inputs["Geometry"])
+    return group
+
+
+def _named_attribute(nodes, name, data_type):
+    node = nodes.new(type="GeometryNodeInputNamedAttribute")
+    node.data_type = data_type
+    node.inputs["Name"].default_value = name
+    return node.outputs["Attribute"]
@@ -0,0 +1,97 @@
+import unittest
+import bpy
+import numpy as np
+from mathutils import Vector
+
+from library.constructors.meshes import new_sphere
+from library.constructors.terrain import new_terrain
+from library.constructors.images import make_image_from_numpy
+from library.constructors.instances import surface_positions, scatter_instances
+
+
+class TestScatterInstances(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    def test_surface_positions(self):
+        """
+        Test that positions follow the evaluated surface, and object transform.
+        """
+        heights = make_image_from_numpy(
+            np.array([[0.0, 0.0], [1.0, 1.0]]), name="Heights", float_buffer=True
+        )
+        terrain = new_terrain(
+            heights,
+            "TestTerrain",
+            2,
+            vertical_scale=2.0,
+            location=(1, 0, 0),
+            polygons=4,
+        )
+        positions = surface_positions(
+            terrain, np.array([0.0, 1.0, 0.5]), np.array([0.0, 1.0, 0.5])
+        )
+        np.testing.assert_array_almost_equal(positions[0], [0, -1, 0], 3)
+        np.testing.assert_array_almost_equal(positions[1], [2, 1, 2], 3)
+
+        # Another modifier (e.g. the curvature dropoff) lowers the surface
+        dropoff = terrain.modifiers.new(name="Dropoff", type="DISPLACE")
+        dropoff.mid_level = 0.0
+        dropoff.strength = -0.5
+        positions = surface_positions(terrain, np.array([0.0]), np.array([0.0]))
+        np.testing.assert_array_almost_equal(positions[0], [0, -1, -0.5], 3)
+
+    def test_scatter_object(self):
+        """
+        Test that many instances are made as one point cloud object.
+        """
+        sphere = new_sphere(location=(0, 0, 0), radius=0.1, name="TestSphere")
+        count = 1000
+        positions = np.random.rand(count, 3)
+        objects_before = len(bpy.data.objects)
+        scatter = scatter_instances(
+            sphere,
+            positions,
+            "TestScatter",
+            rotations=np.random.rand(count, 3),
+            scales=np.random.rand(count),
+        )
+        self.assertEqual(len(bpy.data.objects), objects_before + 1)
+        self.assertEqual(scatter.name, "TestScatter")
+        self.assertEqual(len(scatter.data.vertices), count)
+        self.assertEqual(scatter.data.vertices[5].co, Vector(positions[5]))
+        self.assertTrue("instance_scale" in scatter.data.attributes)
+
+        # Count the instances in the evaluated scene
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        instances = [i for i in depsgraph.object_instances if i.is_instance]
+        self.assertEqual(len(instances), count)
+
+    def test_scatter_collection(self):
+        """
+        Test that a collection source picks instances from its children.
+        """
+        variants = bpy.data.collections.new("Variants")
+        variants.objects.link(new_sphere((0, 0, 0), 0.1, "Small"))
+        variants.objects.link(new_sphere((0, 0, 0), 0.2, "Large"))
+        scatter = scatter_instances(
+            variants,
+            np.zeros((10, 3)),
+            "TestScatter",
+            indices=np.arange(10) % 2,
+        )
+        nodes = scatter.modifiers["Instances"].node_group.nodes
+        self.assertTrue(any(n.type == "COLLECTION_INFO" for n in nodes))
+
+    def test_wrong_size(self):
+        """
+        Test that per-instance arrays of the wrong length are rejected.
+        """
+        sphere = new_sphere(location=(0, 0, 0), radius=0.1, name="TestSphere")
+        with self.assertRaises(ValueError):
+            scatter_instances(sphere, np.zeros((4, 3)), "Bad", scales=np.ones(3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+# Library functions for creating materials in Blender
+
+import bpy
+
+
+def new_vertex_colour_material(
+    name, attribute_name="Colour", roughness=0.5, metallic=0.0
+):
+    """
+    Creates a new material coloured from a mesh colour attribute.
+
+    Parameters:
+    - name (str): The name of the material.
+    - attribute_name (str): The name of the colour attribute to read
+                            (as written by colours.set_vertex_colours).
+    - roughness (float): The roughness of the material.
+    - metallic (float): The metallic value of the material.
+
+    Returns:
+    - bpy.types.Material: The created material.
+    """
+    material = bpy.data.materials.new(name)
+    material.use_nodes = True
+    bsdf = material.node_tree.nodes["Principled BSDF"]
+    bsdf.inputs["Roughness"].default_value = roughness
+    bsdf.inputs["Metallic"].default_value = metallic
+    attribute_node = material.node_tree.nodes.new(type="ShaderNodeAttribute")
+    attribute_node.attribute_type = "GEOMETRY"
+    attribute_node.attribute_name = attribute_name
+    material.node_tree.links.new(
+        attribute_node.outputs["Color"], bsdf.inputs["Base Color"]
+    )
+    return material
+
+
+def new_image_material(name, image, rotation=0.0, roughness=0.5, metallic=0.0):
+    """
+    Creates a new material coloured from an image, mapped by UV.
+
+    Parameters:
+    - name (str): The name of the material.
+    - image (bpy.types.Image): The image to use for the colour.
+    - rotation (float): The rotation of the image around the z-axis, in radians.
+    - roughness (float): The roughness of the material.
+    - metallic (float): The metallic value of the material.
+
+    Returns:
+    - bpy.types.Material: The created material.
+    """
+    material = bpy.data.materials.new(name)
+    material.diffuse_color = (0.5, 0.5, 0.5, 1.0)
+    material.use_nodes = True
+    nodes = material.node_tree.nodes
+    bsdf = nodes["Principled BSDF"]
+    bsdf.inputs["Roughness"].default_value = roughness
+    bsdf.inputs["Metallic"].default_value = metallic
+    mapping_node = nodes.new(type="ShaderNodeMapping")
+    mapping_node.inputs["Rotation"].default_value[2] = rotation
+    tex_coord_node = nodes.new(type="ShaderNodeTexCoord")
+    texture_node = nodes.new(type="ShaderNodeTexImage")
+    texture_node.image = image
+    material.node_tree.links.new(
+        tex_coord_node.outputs["UV"], mapping_node.inputs["Vector"]
+    )
+    material.node_tree.links.new(
+        mapping_node.outputs["Vector"], texture_node.inputs["Vector"]
+    )
+    material.node_tree.links.new(
+        texture_node.outputs["Color"], bsdf.inputs["Base Color"]
+    )
+    return material
@@ -0,0 +1,42 @@
+import unittest
+import bpy
+import numpy as np
+
+from library.constructors.images import make_image_from_numpy
+from library.constructors.materials import (
+    new_vertex_colour_material,
+    new_image_material,
+)
+
+
+class TestMaterialConstructors(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    def test_new_vertex_colour_material(self):
+        """
+        Test that the material reads the named attribute into the base colour.
+        """
+        material = new_vertex_colour_material("TestMaterial", attribute_name="Height")
+        self.assertEqual(material.name, "TestMaterial")
+        bsdf = material.node_tree.nodes["Principled BSDF"]
+        links = bsdf.inputs["Base Color"].links
+        self.assertEqual(len(links), 1)
+        self.assertEqual(links[0].from_node.type, "ATTRIBUTE")
+        self.assertEqual(links[0].from_node.attribute_name, "Height")
+
+    def test_new_image_material(self):
+        """
+        Test that the material reads the image into the base colour.
+        """
+        img = make_image_from_numpy(np.random.rand(4, 4), name="TestImage")
+        material = new_image_material("TestMaterial", img, rotation=1.0)
+        bsdf = material.node_tree.nodes["Principled BSDF"]
+        links = bsdf.inputs["Base Color"].links
+        self.assertEqual(links[0].from_node.type, "TEX_IMAGE")
+        self.assertEqual(links[0].from_node.image, img)
+
+
+if __name__ == "__main__":
+    unittest.main()
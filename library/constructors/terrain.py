@@ -0,0 +1,279 @@
+# Library functions for creating terrain in Blender
+#
+# A terrain is a grid, displaced by a height image. The grid resolution can be
+#  given directly, or chosen to fit a memory or triangle budget.
+
+import math
+import bpy
+import numpy as np
+
+from library.constructors.meshes import new_grid
+from library.utilities import get_peak_memory, get_current_memory
+
+# Approximate memory use, in bytes. These are rough figures for Blender 4.x and
+#  Cycles - compare with the reported peak usage and adjust if needed.
+# Mesh: vertex positions and normals, face offsets, corner vertex/edge indices
+#  and UVs, and edges - doubled because the modifiers make an evaluated copy.
+MESH_BYTES_PER_POLYGON = 2 * 124
+# Render: triangulated geometry and the BVH, two triangles per polygon
+RENDER_BYTES_PER_POLYGON = 2 * 120
+# Textures: the image, plus the copy made for rendering
+TEXTURE_COPIES = 2
+
+
+def estimate_terrain_memory(polygons, texture_bytes=0, texture_level=0):
+    """
+    Estimates the memory needed for a terrain grid and its textures.
+
+    Parameters:
+    - polygons (int): The number of polygons along each side of the grid.
+    - texture_bytes (int): The size of the full-resolution textures in memory.
+    - texture_level (int): The texture reduction level (each level halves the
+                           width and height of the textures).
+
+    Returns:
+    - dict: The estimated bytes for 'mesh', 'render' (geometry and BVH),
+            'texture', and 'total'.
+    """
+    estimate = {
+        "mesh": MESH_BYTES_PER_POLYGON * polygons**2,
+        "render": RENDER_BYTES_PER_POLYGON * polygons**2,
+        "texture": TEXTURE_COPIES * texture_bytes // 4**texture_level,
+    }
+    estimate["total"] = sum(estimate.values())
+    return estimate
+
+
+def choose_terrain_resolution(
+    memory_budget=None,
+    triangle_budget=None,
+    render_resolution=None,
+    texture_bytes=0,
+    max_polygons=None,
+    triangles_per_pixel=4.0,
+    texture_fraction=0.5,
+):
+    """
+    Chooses a terrain grid resolution, and texture level, to fit a budget.
+
+    The textures are reduced until they use no more than texture_fraction of the
+    memory budget, and the grid is then made as fine as the rest of the budget
+    allows - but no finer than the triangle budget, the render resolution, or
+    max_polygons make useful.
+
+    Parameters:
+    - memory_budget (int): The maximum memory to use, in bytes.
+    - triangle_budget (int): The maximum number of triangles.
+    - render_resolution (tuple): The (x, y) resolution of the render.
+    - texture_bytes (int): The size of the full-resolution textures in memory.
+    - max_polygons (int): The maximum number of polygons along each side.
+    - triangles_per_pixel (float): The most triangles per rendered pixel worth having.
+    - texture_fraction (float): The largest fraction of the memory budget for textures.
+
+    Returns:
+    - dict: 'polygons' (along each side of the grid), 'texture_level', and
+            'estimate' (see estimate_terrain_memory).
+    """
+    if memory_budget is None and triangle_budget is None:
+        raise ValueError("Need a memory_budget or a triangle_budget")
+
+    limits = []
+    if max_polygons is not None:
+        limits.append(max_polygons)
+    if triangle_budget is not None:
+        limits.append(math.isqrt(int(triangle_budget // 2)))
+    if render_resolution is not None:
+        pixels = render_resolution[0] * render_resolution[1]
+        limits.append(math.isqrt(int(triangles_per_pixel * pixels // 2)))
+
+    texture_level = 0
+    if memory_budget is not None:
+        while (
+            estimate_terrain_memory(0, texture_bytes, texture_level)["total"]
+            > memory_budget * texture_fraction
+        ):
+            texture_level += 1
+        remaining = (
+            memory_budget
+            - estimate_terrain_memory(0, texture_bytes, texture_level)["total"]
+        )
+        per_polygon = MESH_BYTES_PER_POLYGON + RENDER_BYTES_PER_POLYGON
+        limits.append(math.isqrt(int(remaining // per_polygon)))
+
+    polygons = max(1, min(limits))
+    return {
+        "polygons": polygons,
+        "texture_level": texture_level,
+        "estimate": estimate_terrain_memory(polygons, texture_bytes, texture_level),
+    }
+
+
+def get_image_bytes(img):
+    """
+    Gets the size of an image in memory.
+
+    Parameters:
+    - img (bpy.types.Image): The image.
+
+    Returns:
+    - int: The size, in bytes (4 bytes per pixel, or 16 for float images).
+    """
+    return get_size_bytes(img.size[0], img.size[1], img.is_float)
+
+
+def get_size_bytes(width, height, is_float=False, texture_level=0):
+    """
+    Gets the size in memory of an image of a given size (e.g. not loaded yet).
+
+    Parameters:
+    - width (int): The width of the image.
+    - height (int): The height of the image.
+    - is_float (bool): If True, the image is stored as floats.
+    - texture_level (int): The reduction level (see reduce_image).
+
+    Returns:
+    - int: The size, in bytes (4 bytes per pixel, or 16 for float images).
+    """
+    width = max(1, width >> texture_level)
+    height = max(1, height >> texture_level)
+    return width * height * (16 if is_float else 4)
+
+
+def reduce_image(img, texture_level):
+    """
+    Reduces an image in size, halving its width and height for each level.
+
+    Parameters:
+    - img (bpy.types.Image): The image (scaled in place).
+    - texture_level (int): The reduction level (0 leaves the image as it is).
+    """
+    if texture_level > 0:
+        img.scale(
+            max(1, img.size[0] >> texture_level),
+            max(1, img.size[1] >> texture_level),
+        )
+
+
+def new_terrain(
+    heights,
+    name,
+    size,
+    vertical_scale,
+    location=(0, 0, 0),
+    rotation=(0, 0, 0),
+    polygons=None,
+    memory_budget=None,
+    triangle_budget=None,
+    render_resolution=None,
+    textures=(),
+    max_polygons=None,
+    texture_sizes=(),
+):
+    """
+    Creates a new terrain in the Blender scene.
+
+    Either give the resolution (polygons), or a memory_budget and/or
+    triangle_budget, to have the resolution chosen (see choose_terrain_resolution).
+    With a memory budget, the height image and textures may be reduced in size.
+
+    Parameters:
+    - heights (bpy.types.Image): The height image (used to displace the grid).
+    - name (str): The name of the terrain object.
+    - size (float): The size of the terrain.
+    - vertical_scale (float): The height per unit of the height image.
+    - location (tuple): The location of the terrain as a (x, y, z) tuple.
+    - rotation (tuple): The rotation of the terrain as a (x, y, z) tuple in radians.
+    - polygons (int): The number of polygons along each side of the grid.
+    - memory_budget (int): The maximum memory to use, in bytes.
+    - triangle_budget (int): The maximum number of triangles.
+    - render_resolution (tuple): The (x, y) resolution of the render.
+    - textures (list): Other images used on the terrain (e.g. colour), to count
+                       in the memory budget.
+    - max_polygons (int): The maximum number of polygons along each side.
+    - texture_sizes (list): The (width, height, is_float) sizes of images used
+                            on the terrain that aren't loaded yet, to count in
+                            the memory budget. Reduce them with reduce_image
+                            (and the terrain's 'texture_level') once loaded.
+
+    Returns:
+    - bpy.types.Object: The created terrain object. Its 'polygons', 'texture_level'
+      and 'memory_estimate' custom properties record the choices made.
+    """
+    images = [heights] + list(textures)
+    texture_level = 0
+    if polygons is None:
+        choice = choose_terrain_resolution(
+            memory_budget=memory_budget,
+            triangle_budget=triangle_budget,
+            render_resolution=render_resolution,
+            texture_bytes=sum(get_image_bytes(img) for img in images)
+            + sum(get_size_bytes(*size) for size in texture_sizes),
+            max_polygons=max_polygons,
+        )
+        polygons = choice["polygons"]
+        texture_level = choice["texture_level"]
+    for img in images:
+        reduce_image(img, texture_level)
+    estimate = estimate_terrain_memory(
+        polygons,
+        sum(get_image_bytes(img) for img in images)
+        + sum(get_size_bytes(*size, texture_level) for size in texture_sizes),
+    )
+
+    terrain = new_grid(
+        location=location,
+        size=size,
+        name=name,
+        xres=polygons,
+        yres=polygons,
+        rotation=rotation,
+    )
+    terrain["polygons"] = polygons
+    terrain["texture_level"] = texture_level
+    # Float, as integer custom properties are only 32-bit
+    terrain["memory_estimate"] = float(estimate["total"])
+
+    # Smooth the terrain
+    terrain.data.polygons.foreach_set(
+        "use_smooth", np.ones(len(terrain.data.polygons), dtype=bool)
+    )
+
+    # Add a displace modifier for the heights
+    displace_modifier = terrain.modifiers.new(name="Displacement", type="DISPLACE")
+    displace_modifier.strength = vertical_scale
+    displace_modifier.direction = "Z"
+    displace_modifier.mid_level = 0.0
+    displace_modifier.texture_coords = "UV"
+    displace_modifier.texture = bpy.data.textures.new(name="Displacement", type="IMAGE")
+    displace_modifier.texture.extension = "EXTEND"
+    displace_modifier.texture.image = heights
+    return terrain
+
+
+def report_terrain_memory(terrain):
+    """
+    Prints the estimated memory use of a terrain against the actual use.
+
+    The actual use is the current use, and the peak over the whole process -
+    which, in a long-running process (e.g. the worker), may be from an earlier
+    scene.
+
+    Parameters:
+    - terrain (bpy.types.Object): The terrain object (made by new_terrain).
+    """
+
+    def megabytes(size):
+        return "unknown" if size is None else "%.0f MB" % (size / 1024**2)
+
+    print(
+        "Terrain %s: %d polygons per side, texture level %d, estimated %s,"
+        " current %s, process peak %s"
+        % (
+            terrain.name,
+            terrain["polygons"],
+            terrain["texture_level"],
+            megabytes(terrain["memory_estimate"]),
+            megabytes(get_current_memory()),
+            megabytes(get_peak_memory()),
+        )
+    )
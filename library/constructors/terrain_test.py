@@ -0,0 +1,128 @@
+import unittest
+import bpy
+import numpy as np
+
+from library.constructors.images import make_image_from_numpy
+from library.constructors.terrain import (
+    estimate_terrain_memory,
+    choose_terrain_resolution,
+    new_terrain,
+    get_image_bytes,
+    get_size_bytes,
+    reduce_image,
+    MESH_BYTES_PER_POLYGON,
+    RENDER_BYTES_PER_POLYGON,
+)
+
+
+class TestTerrainResolution(unittest.TestCase):
+    def test_estimate(self):
+        """
+        Test that the estimate scales with polygons and texture level.
+        """
+        estimate = estimate_terrain_memory(100, texture_bytes=4**3)
+        self.assertEqual(estimate["mesh"], MESH_BYTES_PER_POLYGON * 100**2)
+        self.assertEqual(
+            estimate["total"],
+            estimate["mesh"] + estimate["render"] + estimate["texture"],
+        )
+        reduced = estimate_terrain_memory(100, texture_bytes=4**3, texture_level=1)
+        self.assertEqual(reduced["texture"] * 4, estimate["texture"])
+
+    def test_needs_budget(self):
+        """
+        Test that a memory or triangle budget is required.
+        """
+        with self.assertRaises(ValueError):
+            choose_terrain_resolution()
+
+    def test_triangle_budget(self):
+        """
+        Test that the triangle budget limits the resolution.
+        """
+        choice = choose_terrain_resolution(triangle_budget=2 * 500**2)
+        self.assertEqual(choice["polygons"], 500)
+        choice = choose_terrain_resolution(triangle_budget=2 * 500**2, max_polygons=200)
+        self.assertEqual(choice["polygons"], 200)
+
+    def test_render_resolution(self):
+        """
+        Test that there are no more triangles than are useful at the render size.
+        """
+        choice = choose_terrain_resolution(
+            triangle_budget=10**9, render_resolution=(100, 50), triangles_per_pixel=4
+        )
+        self.assertEqual(choice["polygons"], 100)
+
+    def test_memory_budget(self):
+        """
+        Test that the estimate fits in the memory budget, with reduced textures.
+        """
+        budget = 100 * 1024**2
+        choice = choose_terrain_resolution(memory_budget=budget, texture_bytes=1024**3)
+        self.assertGreater(choice["texture_level"], 0)
+        self.assertLessEqual(choice["estimate"]["texture"], budget / 2)
+        self.assertLessEqual(choice["estimate"]["total"], budget)
+        # And is nearly full
+        per_polygon = MESH_BYTES_PER_POLYGON + RENDER_BYTES_PER_POLYGON
+        self.assertGreater(
+            choice["estimate"]["total"] + per_polygon * 2 * choice["polygons"],
+            budget,
+        )
+
+
+class TestNewTerrain(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    def test_new_terrain(self):
+        """
+        Test that the terrain is a displaced grid of the chosen resolution.
+        """
+        heights = make_image_from_numpy(np.random.rand(16, 16), name="Heights")
+        terrain = new_terrain(
+            heights, "TestTerrain", size=2, vertical_scale=3, triangle_budget=2 * 8**2
+        )
+        self.assertEqual(terrain.name, "TestTerrain")
+        self.assertEqual(terrain["polygons"], 8)
+        self.assertEqual(len(terrain.data.polygons), 8 * 8)
+        self.assertTrue(all(p.use_smooth for p in terrain.data.polygons))
+        self.assertEqual(terrain.modifiers["Displacement"].strength, 3)
+        self.assertEqual(terrain.modifiers["Displacement"].texture.image, heights)
+
+    def test_texture_reduction(self):
+        """
+        Test that images are reduced to fit a small memory budget.
+        """
+        heights = make_image_from_numpy(np.random.rand(64, 64), name="Heights")
+        new_terrain(
+            heights, "TestTerrain", size=2, vertical_scale=1, memory_budget=10**5
+        )
+        self.assertLess(heights.size[0], 64)
+
+    def test_texture_sizes(self):
+        """
+        Test that the sizes of images not loaded yet count in the memory budget.
+        """
+        heights = make_image_from_numpy(np.random.rand(16, 16), name="Heights")
+        terrain = new_terrain(
+            heights,
+            "TestTerrain",
+            size=2,
+            vertical_scale=1,
+            memory_budget=10**6,
+            texture_sizes=[(1024, 1024, False)],
+        )
+        self.assertGreater(terrain["texture_level"], 0)
+        self.assertLessEqual(terrain["memory_estimate"], 10**6)
+        texture = make_image_from_numpy(np.random.rand(8, 8), name="Texture")
+        reduce_image(texture, 2)
+        self.assertEqual(tuple(texture.size), (2, 2))
+        self.assertEqual(
+            get_size_bytes(8, 8, texture_level=2), get_image_bytes(texture)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
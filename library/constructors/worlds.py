@@ -0,0 +1,59 @@
+# Library functions for creating worlds (sky and background lighting) in Blender
+
+import bpy
+
+
+def new_sky_world(name="Sky", strength=1.0, active=True):
+    """
+    Creates a new world lit by a sky texture.
+
+    Parameters:
+    - name (str): The name of the world.
+    - strength (float): The strength of the sky lighting.
+    - active (bool): If True, set the world as the world for the scene.
+
+    Returns:
+    - bpy.types.World: The created world.
+    """
+    world = bpy.data.worlds.new(name)
+    world.use_nodes = True
+    nodes = world.node_tree.nodes
+    links = world.node_tree.links
+
+    # Clear existing nodes to start fresh
+    nodes.clear()
+
+    sky_texture_node = nodes.new(type="ShaderNodeTexSky")
+    background_node = nodes.new(type="ShaderNodeBackground")
+    background_node.inputs["Strength"].default_value = strength
+    output_node = nodes.new(type="ShaderNodeOutputWorld")
+    links.new(sky_texture_node.outputs["Color"], background_node.inputs["Color"])
+    links.new(background_node.outputs["Background"], output_node.inputs["Surface"])
+    if active:
+        bpy.context.scene.world = world
+    return world
+
+
+def new_colour_world(
+    name="Background", colour=(0.7, 0.7, 0.7, 1.0), strength=1.0, active=True
+):
+    """
+    Creates a new world lit by a uniform colour.
+
+    Parameters:
+    - name (str): The name of the world.
+    - colour (tuple): The (r, g, b, a) colour of the background.
+    - strength (float): The strength of the lighting.
+    - active (bool): If True, set the world as the world for the scene.
+
+    Returns:
+    - bpy.types.World: The created world.
+    """
+    world = bpy.data.worlds.new(name)
+    world.use_nodes = True
+    background_node = world.node_tree.nodes["Background"]
+    background_node.inputs["Color"].default_value = colour
+    background_node.inputs["Strength"].default_value = strength
+    if active:
+        bpy.context.scene.world = world
+    return world
@@ -0,0 +1,28 @@
+import unittest
+import bpy
+
+from library.constructors.worlds import new_sky_world, new_colour_world
+
+
+class TestWorldConstructors(unittest.TestCase):
+    def setUp(self):
+        # Cleanup before each test
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+
+    def test_new_sky_world(self):
+        world = new_sky_world("TestSky", strength=2.0)
+        self.assertEqual(bpy.context.scene.world, world)
+        nodes = world.node_tree.nodes
+        self.assertTrue(any(node.type == "TEX_SKY" for node in nodes))
+        background = [node for node in nodes if node.type == "BACKGROUND"][0]
+        self.assertEqual(background.inputs["Strength"].default_value, 2.0)
+
+    def test_new_colour_world(self):
+        world = new_colour_world("TestBackground", colour=(1, 0, 0, 1), active=False)
+        self.assertNotEqual(bpy.context.scene.world, world)
+        colour = world.node_tree.nodes["Background"].inputs["Color"].default_value
+        self.assertEqual(tuple(colour), (1, 0, 0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
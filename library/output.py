@@ -0,0 +1,325 @@
+# Write rendered frames to files, or to a video, on a background thread
+#
+# Encoding and compressing each frame takes time. Handing the frames (as numpy
+#  arrays, from library.rendering) to a writer thread lets the next frame render
+#  while the last one is being written. The queue of frames waiting to be
+#  written is bounded, so a slow writer holds up rendering rather than filling
+#  memory.
+#
+#   with FrameWriter("/path/to/frames_", format="PNG") as writer:
+#       render_frames_to_numpy(range(1, 101), callback=writer)
+#
+# PNG and EXR files are encoded here (with numpy and zlib), video by piping the
+#  frames to a local ffmpeg. PNG and video frames are converted with the plain
+#  sRGB curve - Blender's 'Standard' view transform - so they only match
+#  Blender's own output for scenes using that (see check_view_settings).
+
+import queue
+import struct
+import threading
+import subprocess
+import zlib
+import bpy
+import numpy as np
+
+from library.constructors.colours import linear_to_srgb
+
+FORMATS = ("PNG", "EXR", "FFMPEG")
+
+
+def encode_png(arr, compress_level=1, bit_depth=8):
+    """
+    Encodes an image as a PNG file.
+
+    Parameters:
+    - arr (numpy.ndarray): The image, shape (height, width) or (height, width, channels),
+                           1-4 channels, values 0-1, row 0 at the top.
+    - compress_level (int): The zlib compression level (0-9) - low is fast.
+    - bit_depth (int): 8 or 16 bits per channel.
+
+    Returns:
+    - bytes: The PNG file contents.
+    """
+    if arr.ndim == 2:
+        arr = arr[:, :, np.newaxis]
+    height, width, channels = arr.shape
+    colour_type = {1: 0, 2: 4, 3: 2, 4: 6}[channels]
+    arr = np.clip(arr, 0.0, 1.0)
+    if bit_depth == 8:
+        data = (arr * 255 + 0.5).astype(np.uint8)
+    elif bit_depth == 16:
+        data = (arr * 65535 + 0.5).astype(">u2")
+    else:
+        raise ValueError("PNG bit depth must be 8 or 16")
+    # Each row starts with its filter type (0 - none)
+    rows = np.zeros((height, 1 + width * channels * data.itemsize), dtype=np.uint8)
+    rows[:, 1:] = np.ascontiguousarray(data).reshape((height, -1)).view(np.uint8)
+
+    def chunk(kind, content):
+        return (
+            struct.pack(">I", len(content))
+            + kind
+            + content
+            + struct.pack(">I", zlib.crc32(kind + content) & 0xFFFFFFFF)
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, colour_type, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows.tobytes(), compress_level))
+        + chunk(b"IEND", b"")
+    )
+
+
+def encode_exr(arr):
+    """
+    Encodes an image as an (uncompressed, 32-bit float) OpenEXR file.
+
+    Parameters:
+    - arr (numpy.ndarray): The image, shape (height, width) or (height, width, channels),
+                           1, 3 or 4 channels, row 0 at the top.
+
+    Returns:
+    - bytes: The EXR file contents.
+    """
+    if arr.ndim == 2:
+        arr = arr[:, :, np.newaxis]
+    height, width, channels = arr.shape
+    names = {1: "Y", 3: "RGB", 4: "RGBA"}[channels]
+    # Channels are stored in alphabetical order
+    order = sorted(range(channels), key=lambda i: names[i])
+
+    def attribute(name, kind, content):
+        return (
+            name.encode()
+            + b"\0"
+            + kind.encode()
+            + b"\0"
+            + struct.pack("<i", len(content))
+            + content
+        )
+
+    channel_list = (
+        b"".join(
+            names[i].encode() + b"\0" + struct.pack("<iB3xii", 2, 0, 1, 1)
+            for i in order
+        )
+        + b"\0"
+    )
+    window = struct.pack("<iiii", 0, 0, width - 1, height - 1)
+    header = (
+        struct.pack("<ii", 20000630, 2)
+        + attribute("channels", "chlist", channel_list)
+        + attribute("compression", "compression", struct.pack("<B", 0))
+        + attribute("dataWindow", "box2i", window)
+        + attribute("displayWindow", "box2i", window)
+        + attribute("lineOrder", "lineOrder", struct.pack("<B", 0))
+        + attribute("pixelAspectRatio", "float", struct.pack("<f", 1.0))
+        + attribute("screenWindowCenter", "v2f", struct.pack("<ff", 0.0, 0.0))
+        + attribute("screenWindowWidth", "float", struct.pack("<f", 1.0))
+        + b"\0"
+    )
+
+    # One block per scanline: y, data size, then each channel in turn
+    line_size = channels * width * 4
+    blocks = np.empty((height, 8 + line_size), dtype=np.uint8)
+    blocks[:, :8] = (
+        np.stack((np.arange(height), np.full(height, line_size)), axis=1)
+        .astype("<i4")
+        .view(np.uint8)
+    )
+    planar = np.ascontiguousarray(arr[:, :, order].transpose(0, 2, 1), dtype="<f4")
+    blocks[:, 8:] = planar.reshape((height, -1)).view(np.uint8)
+    offsets = len(header) + 8 * height + np.arange(height) * (8 + line_size)
+    return header + offsets.astype("<u8").tobytes() + blocks.tobytes()
+
+
+def check_view_settings(scene=None):
+    """
+    Checks that a scene's colour management is reproduced by FrameWriter.
+
+    FrameWriter converts PNG and video frames with the plain sRGB curve, which
+    matches Blender's output only with the 'Standard' view transform, no look,
+    and no exposure or gamma change (Blender 4 defaults to 'AgX').
+
+    Parameters:
+    - scene (bpy.types.Scene): The scene (default: the current scene).
+
+    Raises:
+    - ValueError: If the scene's view settings would not be reproduced.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    view = scene.view_settings
+    display = scene.display_settings.display_device
+    if (
+        view.view_transform != "Standard"
+        or view.look not in ("None", "")
+        or view.exposure != 0.0
+        or view.gamma != 1.0
+        or display != "sRGB"
+    ):
+        raise ValueError(
+            "FrameWriter only reproduces the 'Standard' view transform on an sRGB"
+            " display, with no look, exposure or gamma (scene has %r, look %r,"
+            " exposure %g, gamma %g, display %r) - set"
+            " scene.view_settings.view_transform = 'Standard', or write EXR"
+            % (view.view_transform, view.look, view.exposure, view.gamma, display)
+        )
+
+
+class FrameWriter:
+    """
+    Writes frames to files, or a video, on a background thread.
+
+    Frames are given as numpy arrays (or the results of library.rendering
+    render_to_numpy), with row 0 at the bottom and scene-linear values, as
+    Blender makes them. PNG and video frames are converted to sRGB; EXR
+    frames are written as they are. Only Blender's 'Standard' view transform is
+    reproduced, so for PNG and video the scene's view settings are checked (see
+    check_view_settings) when the writer is made.
+
+    The writer can be used as the callback for render_frames_to_numpy.
+    """
+
+    def __init__(
+        self,
+        prefix,
+        format="PNG",
+        max_queued=4,
+        compress_level=1,
+        bit_depth=8,
+        pass_name="Image",
+        fps=24,
+        ffmpeg="ffmpeg",
+        ffmpeg_args=("-c:v", "libx264", "-pix_fmt", "yuv420p", "-crf", "18"),
+        video_path=None,
+        scene=None,
+    ):
+        """
+        Parameters:
+        - prefix (str): The output file name root - frames are written to
+                        prefix + frame number (4 digits) + extension.
+        - format (str): 'PNG', 'EXR', or 'FFMPEG' (video).
+        - max_queued (int): The most frames waiting to be written.
+        - compress_level (int): The PNG compression level (0-9) - low is fast.
+        - bit_depth (int): The PNG bits per channel (8 or 16).
+        - pass_name (str): The pass to write, from render_to_numpy results.
+        - fps (float): The video frame rate.
+        - ffmpeg (str): The ffmpeg program.
+        - ffmpeg_args (tuple): The ffmpeg output (encoding) options.
+        - video_path (str): The video file (default: prefix + '.mp4').
+        - scene (bpy.types.Scene): The scene whose view settings the frames should
+                                   match (default: the current scene).
+        """
+        if format not in FORMATS:
+            raise ValueError("Unsupported output format: %s" % format)
+        if format != "EXR":
+            check_view_settings(scene)
+        self.prefix = prefix
+        self.format = format
+        self.compress_level = compress_level
+        self.bit_depth = bit_depth
+        self.pass_name = pass_name
+        self.fps = fps
+        self.ffmpeg = ffmpeg
+        self.ffmpeg_args = list(ffmpeg_args)
+        self.video_path = video_path if video_path is not None else prefix + ".mp4"
+        self.encoder = None
+        self.error = None
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, frame, image):
+        """
+        Queues a frame to be written (waits if the queue is full).
+
+        Parameters:
+        - frame (int): The frame number.
+        - image (numpy.ndarray or dict): The frame, or render_to_numpy results.
+        """
+        self._check()
+        if isinstance(image, dict):
+            image = image[self.pass_name]
+        self.queue.put((frame, image))
+
+    __call__ = submit
+
+    def close(self):
+        """
+        Waits for all the queued frames to be written, and finishes the video.
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.encoder is not None:
+            self.encoder.stdin.close()
+            if self.encoder.wait() != 0 and self.error is None:
+                self.error = RuntimeError(
+                    "ffmpeg failed (%d)" % self.encoder.returncode
+                )
+            self.encoder = None
+        self._check()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _check(self):
+        # Pass on any error from the writer thread
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue  # Drop frames after an error, until closed
+            try:
+                self._write(*item)
+            except Exception as error:
+                self.error = error
+
+    def _write(self, frame, image):
+        image = image[::-1]  # Row 0 at the top, for files
+        if self.format == "EXR":
+            self._write_file(frame, ".exr", encode_exr(image))
+            return
+        if image.ndim == 3 and image.shape[2] >= 3:
+            image = np.concatenate(
+                (linear_to_srgb(image[:, :, :3]), image[:, :, 3:]), axis=2
+            )
+        if self.format == "PNG":
+            content = encode_png(image, self.compress_level, self.bit_depth)
+            self._write_file(frame, ".png", content)
+        else:
+            self._write_video(image)
+
+    def _write_file(self, frame, extension, content):
+        with open("%s%04d%s" % (self.prefix, frame, extension), "wb") as f:
+            f.write(content)
+
+    def _write_video(self, image):
+        if image.ndim == 2:
+            image = np.repeat(image[:, :, np.newaxis], 3, axis=2)
+        if image.shape[2] == 3:
+            image = np.dstack((image, np.ones(image.shape[:2], dtype=image.dtype)))
+        if self.encoder is None:
+            self.encoder = subprocess.Popen(
+                [self.ffmpeg, "-y", "-loglevel", "error"]
+                + ["-f", "rawvideo", "-pix_fmt", "rgba"]
+                + ["-s", "%dx%d" % (image.shape[1], image.shape[0])]
+                + ["-r", str(self.fps), "-i", "-"]
+                + self.ffmpeg_args
+                + [self.video_path],
+                stdin=subprocess.PIPE,
+            )
+        data = (np.clip(image, 0.0, 1.0) * 255 + 0.5).astype(np.uint8)
+        self.encoder.stdin.write(data.tobytes())
@@ -0,0 +1,108 @@
+import unittest
+import os
+import shutil
+import tempfile
+import bpy
+import numpy as np
+
+from library.constructors.images import make_numpy_from_image
+from library.constructors.colours import linear_to_srgb
+from library.output import encode_png, encode_exr, FrameWriter, check_view_settings
+
+
+class TestEncoders(unittest.TestCase):
+    def setUp(self):
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        self.directory = tempfile.TemporaryDirectory()
+        self.arr = np.random.rand(5, 7, 4).astype(np.float32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self, name, content):
+        # Write a file, and read it back with Blender
+        path = os.path.join(self.directory.name, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return make_numpy_from_image(bpy.data.images.load(path))
+
+    def test_png(self):
+        """
+        Test that Blender reads back the PNG (with row 0 at the bottom).
+        """
+        loaded = self.load("test.png", encode_png(self.arr, bit_depth=8))
+        np.testing.assert_allclose(loaded, self.arr[::-1], atol=1 / 255)
+
+    def test_exr(self):
+        """
+        Test that Blender reads back the EXR exactly.
+        """
+        arr = self.arr * 100  # Floats are not clipped
+        loaded = self.load("test.exr", encode_exr(arr))
+        np.testing.assert_allclose(loaded, arr[::-1], rtol=1e-6)
+
+    def test_bad_bit_depth(self):
+        with self.assertRaises(ValueError):
+            encode_png(self.arr, bit_depth=12)
+
+
+class TestFrameWriter(unittest.TestCase):
+    def setUp(self):
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        bpy.context.scene.view_settings.view_transform = "Standard"
+        self.directory = tempfile.TemporaryDirectory()
+        self.prefix = os.path.join(self.directory.name, "frame_")
+        self.arr = np.random.rand(4, 6, 4).astype(np.float32)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_frames(self):
+        """
+        Test that all the frames are written, converted to sRGB.
+        """
+        with FrameWriter(self.prefix, format="PNG", max_queued=1) as writer:
+            for frame in range(1, 6):
+                writer(frame, {"Image": self.arr})
+        files = sorted(os.listdir(self.directory.name))
+        self.assertEqual(files, ["frame_%04d.png" % frame for frame in range(1, 6)])
+        loaded = make_numpy_from_image(bpy.data.images.load(self.prefix + "0001.png"))
+        np.testing.assert_allclose(
+            loaded[:, :, :3], linear_to_srgb(self.arr[:, :, :3]), atol=1 / 255
+        )
+
+    def test_view_settings(self):
+        """
+        Test that a view transform the writer can't reproduce is rejected.
+        """
+        check_view_settings()
+        bpy.context.scene.view_settings.view_transform = "AgX"
+        with self.assertRaises(ValueError):
+            FrameWriter(self.prefix, format="PNG")
+        bpy.context.scene.view_settings.view_transform = "Standard"
+        bpy.context.scene.view_settings.exposure = 1.0
+        with self.assertRaises(ValueError):
+            check_view_settings()
+        # EXR frames are scene-linear, so don't depend on the view settings
+        FrameWriter(self.prefix, format="EXR").close()
+
+    def test_write_error(self):
+        """
+        Test that a failure in the writer thread is passed on.
+        """
+        writer = FrameWriter(os.path.join(self.directory.name, "missing", "frame_"))
+        writer.submit(1, self.arr)
+        with self.assertRaises(FileNotFoundError):
+            writer.close()
+
+    @unittest.skipIf(shutil.which("ffmpeg") is None, "Needs ffmpeg")
+    def test_video(self):
+        video_path = os.path.join(self.directory.name, "test.mp4")
+        with FrameWriter(self.prefix, format="FFMPEG", video_path=video_path) as writer:
+            for frame in range(10):
+                writer.submit(frame, self.arr)
+        self.assertGreater(os.path.getsize(video_path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
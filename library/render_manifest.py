@@ -0,0 +1,203 @@
+# Render a set of frames or views so that a re-run only does the missing work
+#
+# A manifest records, for each frame or view, a hash of its inputs, its output
+#  file (and a checksum of that file), and whether it finished. On a re-run,
+#  outputs that are complete and unchanged are skipped.
+#
+# The manifest is a log, one JSON record per line: each update appends a line
+#  (so recording a render doesn't rewrite the whole file), and the last line for
+#  a frame or view wins. It is compacted when loaded.
+
+import os
+import json
+import hashlib
+import bpy
+
+# Blender image file formats, by output file extension (the first is used if
+#  the scene's format doesn't match)
+FILE_FORMATS = {
+    ".png": ("PNG",),
+    ".exr": ("OPEN_EXR", "OPEN_EXR_MULTILAYER"),
+    ".jpg": ("JPEG",),
+    ".jpeg": ("JPEG",),
+    ".tif": ("TIFF",),
+    ".tiff": ("TIFF",),
+    ".bmp": ("BMP",),
+    ".webp": ("WEBP",),
+}
+
+
+def hash_inputs(inputs):
+    """
+    Makes a hash of the inputs to a render.
+
+    Parameters:
+    - inputs (dict): Everything that affects the output (must be JSON serialisable,
+                     other values are converted with str).
+
+    Returns:
+    - str: The hex digest of the inputs.
+    """
+    text = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_checksum(path):
+    """
+    Makes a checksum of the contents of a file.
+
+    Parameters:
+    - path (str): The file to check.
+
+    Returns:
+    - str: The hex digest of the file contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class RenderManifest:
+    """
+    The record of which renders have been done, kept in a log file.
+
+    Each entry is keyed by a frame or view name, and has the input hash, the
+    output path, the status ('started' or 'done'), and the size and checksum
+    of the output file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            records = 0
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:  # Left half-written by an interruption
+                        continue
+                    self.entries[entry.pop("key")] = entry
+                    records += 1
+            if records > len(self.entries):
+                self.save()
+
+    def is_complete(self, key, input_hash, output_path):
+        """
+        Checks whether a render is done, with the same inputs, and its output intact.
+        """
+        entry = self.entries.get(str(key))
+        if entry is None or entry["status"] != "done":
+            return False
+        if entry["input_hash"] != input_hash or entry["output"] != output_path:
+            return False
+        if not os.path.isfile(output_path):
+            return False
+        if os.path.getsize(output_path) != entry["size"]:
+            return False
+        return file_checksum(output_path) == entry["checksum"]
+
+    def update(self, key, input_hash, output_path, status):
+        """
+        Records the status of a render, appending it to the manifest file.
+        """
+        entry = {"input_hash": input_hash, "output": output_path, "status": status}
+        if status == "done":
+            entry["size"] = os.path.getsize(output_path)
+            entry["checksum"] = file_checksum(output_path)
+        self.entries[str(key)] = entry
+        # Each record starts a new line, so one left half-written isn't joined
+        #  to the next
+        with open(self.path, "a") as f:
+            f.write("\n" + json.dumps(dict(entry, key=str(key)), sort_keys=True))
+
+    def save(self):
+        """
+        Writes the whole manifest to disc, one line per entry (via a temporary
+        file, so it is never left half-written).
+        """
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as f:
+            for key, entry in sorted(self.entries.items()):
+                f.write("\n" + json.dumps(dict(entry, key=key), sort_keys=True))
+        os.replace(temporary, self.path)
+
+
+def frame_jobs(frames, prefix, inputs, extension=".png"):
+    """
+    Makes the list of jobs for rendering a sequence of frames.
+
+    Parameters:
+    - frames (iterable): The frame numbers to render.
+    - prefix (str): The output file name root (as set_render_filename).
+    - inputs (dict): The inputs common to all frames (the frame number is added).
+    - extension (str): The output file extension.
+
+    Returns:
+    - list: (key, inputs, output_path) for each frame.
+    """
+    return [
+        (str(frame), dict(inputs, frame=frame), "%s%04d%s" % (prefix, frame, extension))
+        for frame in frames
+    ]
+
+
+def render_resumable(jobs, manifest_path, prepare=None, scene=None):
+    """
+    Renders a set of frames or views, skipping any already done.
+
+    Each output is written in the file format matching its extension (the
+    scene's format is kept if it matches). The scene's output settings are
+    restored afterwards.
+
+    Parameters:
+    - jobs (iterable): (key, inputs, output_path) for each render - e.g. from frame_jobs.
+    - manifest_path (str): The file recording progress.
+    - prepare (function): Called as prepare(key, inputs) to set up the scene for
+                          each render (e.g. move the camera). If not given, and the
+                          inputs have a 'frame', that frame is set.
+    - scene (bpy.types.Scene): The scene to render (default: the current scene).
+
+    Returns:
+    - list: The keys of the jobs that were rendered (not skipped).
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    jobs = list(jobs)
+    for key, inputs, output_path in jobs:
+        if os.path.splitext(output_path)[1].lower() not in FILE_FORMATS:
+            raise ValueError("Unsupported output file type: %s" % output_path)
+    manifest = RenderManifest(manifest_path)
+    rendered = []
+    image_settings = scene.render.image_settings
+    filepath = scene.render.filepath
+    use_file_extension = scene.render.use_file_extension
+    file_format = image_settings.file_format
+    color_depth = image_settings.color_depth
+    scene.render.use_file_extension = False
+    try:
+        for key, inputs, output_path in jobs:
+            file_formats = FILE_FORMATS[os.path.splitext(output_path)[1].lower()]
+            input_hash = hash_inputs(inputs)
+            if manifest.is_complete(key, input_hash, output_path):
+                continue
+            # Marked as started first, so an interrupted render is redone
+            manifest.update(key, input_hash, output_path, "started")
+            if prepare is not None:
+                prepare(key, inputs)
+            elif "frame" in inputs:
+                scene.frame_set(inputs["frame"])
+            if image_settings.file_format not in file_formats:
+                image_settings.file_format = file_formats[0]
+            scene.render.filepath = output_path
+            bpy.ops.render.render(write_still=True, scene=scene.name)
+            manifest.update(key, input_hash, output_path, "done")
+            rendered.append(key)
+    finally:
+        scene.render.filepath = filepath
+        scene.render.use_file_extension = use_file_extension
+        image_settings.file_format = file_format
+        image_settings.color_depth = color_depth  # Changing format may change it
+    return rendered
@@ -0,0 +1,140 @@
+import unittest
+import os
+import tempfile
+import bpy
+
+from library.constructors.meshes import new_plane
+from library.constructors.cameras import new_camera
+from library.render_manifest import (
+    RenderManifest,
+    hash_inputs,
+    frame_jobs,
+    render_resumable,
+)
+
+
+class TestRenderManifest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.directory.name, "manifest.json")
+        self.output = os.path.join(self.directory.name, "frame.png")
+        with open(self.output, "wb") as f:
+            f.write(b"rendered")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_hash_inputs(self):
+        """
+        Test that the hash depends on the input values but not their order.
+        """
+        self.assertEqual(hash_inputs({"a": 1, "b": 2}), hash_inputs({"b": 2, "a": 1}))
+        self.assertNotEqual(hash_inputs({"a": 1}), hash_inputs({"a": 2}))
+
+    def test_complete_after_reload(self):
+        """
+        Test that a finished render is recorded on disc.
+        """
+        manifest = RenderManifest(self.manifest_path)
+        manifest.update("1", "hash", self.output, "done")
+        reloaded = RenderManifest(self.manifest_path)
+        self.assertTrue(reloaded.is_complete("1", "hash", self.output))
+
+    def test_appended(self):
+        """
+        Test that updates are appended to the file, and compacted on reloading.
+        """
+        manifest = RenderManifest(self.manifest_path)
+        manifest.update("1", "hash", self.output, "started")
+        with open(self.manifest_path) as f:
+            started = f.read()
+        manifest.update("1", "hash", self.output, "done")
+        with open(self.manifest_path) as f:
+            self.assertTrue(f.read().startswith(started))
+        with open(self.manifest_path, "a") as f:
+            f.write('\n{"key": "2", "inp')  # Interrupted while writing
+        reloaded = RenderManifest(self.manifest_path)
+        self.assertTrue(reloaded.is_complete("1", "hash", self.output))
+        self.assertNotIn("2", reloaded.entries)
+        with open(self.manifest_path) as f:
+            self.assertEqual(len(f.read().strip().splitlines()), 1)
+
+    def test_incomplete(self):
+        """
+        Test that started, stale, missing and corrupt renders are not complete.
+        """
+        manifest = RenderManifest(self.manifest_path)
+        manifest.update("1", "hash", self.output, "started")
+        self.assertFalse(manifest.is_complete("1", "hash", self.output))
+        manifest.update("1", "hash", self.output, "done")
+        self.assertFalse(manifest.is_complete("1", "other", self.output))
+        self.assertFalse(manifest.is_complete("2", "hash", self.output))
+        with open(self.output, "wb") as f:
+            f.write(b"garbled!")
+        self.assertFalse(manifest.is_complete("1", "hash", self.output))
+        os.remove(self.output)
+        self.assertFalse(manifest.is_complete("1", "hash", self.output))
+
+
+class TestRenderResumable(unittest.TestCase):
+    def setUp(self):
+        """
+        Make a small, quick to render, scene before each test.
+        """
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        scene = bpy.context.scene
+        scene.render.engine = "CYCLES"
+        scene.cycles.samples = 1
+        scene.render.resolution_x = 16
+        scene.render.resolution_y = 8
+        new_plane(location=(0, 0, 0), size=2, name="TestPlane")
+        new_camera((0, 0, 5), (0, 0, 0), "TestCamera")
+        self.directory = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.directory.name, "manifest.json")
+        self.prefix = os.path.join(self.directory.name, "test_")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_resume(self):
+        """
+        Test that a re-run only renders missing and changed frames.
+        """
+        jobs = frame_jobs([1, 2, 3], self.prefix, {"samples": 1})
+        self.assertEqual(render_resumable(jobs, self.manifest_path), ["1", "2", "3"])
+        self.assertTrue(os.path.isfile(self.prefix + "0002.png"))
+        self.assertEqual(render_resumable(jobs, self.manifest_path), [])
+
+        os.remove(self.prefix + "0002.png")
+        self.assertEqual(render_resumable(jobs, self.manifest_path), ["2"])
+
+        jobs = frame_jobs([1, 2, 3], self.prefix, {"samples": 2})
+        self.assertEqual(render_resumable(jobs, self.manifest_path), ["1", "2", "3"])
+
+    def test_file_format(self):
+        """
+        Test that outputs are written in the format of their extension, and the
+        scene's output settings are restored.
+        """
+        scene = bpy.context.scene
+        scene.render.filepath = "//original_"
+        scene.render.image_settings.file_format = "OPEN_EXR"
+        jobs = frame_jobs([1], self.prefix, {}, extension=".png")
+        render_resumable(jobs, self.manifest_path)
+        with open(self.prefix + "0001.png", "rb") as f:
+            self.assertEqual(f.read(8), b"\x89PNG\r\n\x1a\n")
+        self.assertEqual(scene.render.filepath, "//original_")
+        self.assertEqual(scene.render.image_settings.file_format, "OPEN_EXR")
+        self.assertTrue(scene.render.use_file_extension)
+
+        # Every output is checked before anything is rendered
+        jobs = frame_jobs([2], self.prefix, {}) + frame_jobs(
+            [3], self.prefix, {}, extension=".xyz"
+        )
+        with self.assertRaises(ValueError):
+            render_resumable(iter(jobs), self.manifest_path)
+        self.assertFalse(os.path.exists(self.prefix + "0002.png"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+# Functions to render scenes and get the results without writing files
+
+import bpy
+
+from library.constructors.images import make_numpy_from_image
+
+# Render passes that can be returned, and the view layer setting that enables each
+PASSES = {
+    "Image": None,
+    "Depth": "use_pass_z",
+    "Normal": "use_pass_normal",
+    "Mist": "use_pass_mist",
+}
+
+# Number of channels to keep from the viewer image for each pass
+PASS_CHANNELS = {"Image": 4, "Depth": 1, "Normal": 3, "Mist": 1}
+
+
+def render_to_numpy(passes=(), scene=None):
+    """
+    Renders the current frame and returns the result as numpy arrays.
+
+    The result is read from the compositor's viewer image, so it is the
+    scene-linear float data (no view transform applied), with row 0 at the
+    bottom of the image (as make_numpy_from_image).
+    The RGBA image needs one render. The viewer only holds one RGBA image at a
+    time, so the extra passes are packed into the channels of another (e.g.
+    Normal in RGB and Depth in alpha), which needs a second render - and a
+    third if all of Depth, Normal and Mist are wanted. Persistent data is
+    turned on for those renders, so the scene isn't synced again for each, but
+    the frame is still rendered again. For extra passes over a long sequence,
+    render to multilayer EXR files instead (image_settings.file_format =
+    'OPEN_EXR_MULTILAYER'), which hold every pass from a single render.
+
+    The scene's pass settings, persistent data setting and compositor are
+    restored afterwards.
+
+    Parameters:
+    - passes (tuple): Extra passes to return - any of 'Depth', 'Normal', 'Mist'.
+    - scene (bpy.types.Scene): The scene to render (default: the current scene).
+
+    Returns:
+    - dict: numpy arrays keyed by pass name. 'Image' is (height, width, 4),
+            'Normal' is (height, width, 3), 'Depth' and 'Mist' are (height, width).
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    for pass_name in passes:
+        if PASSES.get(pass_name) is None:
+            raise ValueError("Unsupported render pass: %s" % pass_name)
+
+    compositing = (scene.use_nodes, scene.render.use_compositing)
+    use_persistent_data = scene.render.use_persistent_data
+    added = []
+    render_layers, viewer = _get_viewer_nodes(scene, added)
+    view_layer = scene.view_layers[render_layers.layer]
+    pass_settings = {
+        PASSES[pass_name]: getattr(view_layer, PASSES[pass_name])
+        for pass_name in passes
+    }
+    try:
+        for setting in pass_settings:
+            setattr(view_layer, setting, True)
+        if passes:
+            # Keep the synced scene between the renders
+            scene.render.use_persistent_data = True
+        result = {}
+        for group in [("Image",)] + _pack_passes(passes):
+            _link_viewer(scene, render_layers, viewer, group, added)
+            bpy.ops.render.render(write_still=False, scene=scene.name)
+            arr = make_numpy_from_image(bpy.data.images["Viewer Node"])
+            channel = 0
+            for pass_name in group:
+                channels = PASS_CHANNELS[pass_name]
+                if channels == 1:
+                    result[pass_name] = arr[:, :, channel]
+                else:
+                    result[pass_name] = arr[:, :, channel : channel + channels]
+                channel += channels
+        return result
+    finally:
+        for setting, value in pass_settings.items():
+            setattr(view_layer, setting, value)
+        for node in reversed(added):
+            scene.node_tree.nodes.remove(node)
+        scene.use_nodes, scene.render.use_compositing = compositing
+        scene.render.use_persistent_data = use_persistent_data
+
+
+def render_frames_to_numpy(frames, callback=None, passes=(), scene=None):
+    """
+    Renders a sequence of frames and returns the results as numpy arrays.
+
+    Persistent data is on for the whole sequence (and restored afterwards), so
+    only what changes between frames is synced again.
+
+    Parameters:
+    - frames (iterable): The frame numbers to render.
+    - callback (function): If given, called as callback(frame, result) after each
+                           frame is rendered, and the results are not kept.
+    - passes (tuple): Extra passes to return - see render_to_numpy.
+    - scene (bpy.types.Scene): The scene to render (default: the current scene).
+
+    Returns:
+    - list: The result (see render_to_numpy) for each frame, or None if a
+            callback is given.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    results = []
+    use_persistent_data = scene.render.use_persistent_data
+    scene.render.use_persistent_data = True
+    try:
+        for frame in frames:
+            scene.frame_set(frame)
+            result = render_to_numpy(passes=passes, scene=scene)
+            if callback is None:
+                results.append(result)
+            else:
+                callback(frame, result)
+    finally:
+        scene.render.use_persistent_data = use_persistent_data
+    if callback is None:
+        return results
+    return None
+
+
+def _pack_passes(passes):
+    # Group the extra passes into viewer images of up to 4 channels
+    groups = []
+    channels = 4
+    for pass_name in sorted(set(passes), key=lambda name: -PASS_CHANNELS[name]):
+        if channels + PASS_CHANNELS[pass_name] > 4:
+            groups.append(())
+            channels = 0
+        groups[-1] += (pass_name,)
+        channels += PASS_CHANNELS[pass_name]
+    return groups
+
+
+def _link_viewer(scene, render_layers, viewer, group, added):
+    # Connect the passes in a group to the viewer, one after another in its channels
+    nodes = scene.node_tree.nodes
+    links = scene.node_tree.links
+    if group == ("Image",):
+        links.new(render_layers.outputs["Image"], viewer.inputs["Image"])
+        return
+    combine = nodes.new(type="CompositorNodeCombineColor")
+    added.append(combine)
+    channel = 0
+    for pass_name in group:
+        output = render_layers.outputs[pass_name]
+        channels = PASS_CHANNELS[pass_name]
+        if channels == 1:
+            links.new(output, combine.inputs[channel])
+        else:
+            separate = nodes.new(type="CompositorNodeSeparateColor")
+            added.append(separate)
+            links.new(output, separate.inputs[0])
+            for i in range(channels):
+                links.new(separate.outputs[i], combine.inputs[channel + i])
+        channel += channels
+    links.new(combine.outputs[0], viewer.inputs["Image"])
+
+
+def _get_viewer_nodes(scene, added):
+    # Add a Render Layers node feeding a Viewer node to the compositor (the nodes
+    #  made are added to the list, to be removed afterwards).
+    # Keep a Composite node too, so the normal render result is unchanged.
+    scene.use_nodes = True
+    scene.render.use_compositing = True
+    nodes = scene.node_tree.nodes
+    render_layers = nodes.new(type="CompositorNodeRLayers")
+    render_layers.name = "Numpy Render Layers"
+    render_layers.scene = scene
+    viewer = nodes.new(type="CompositorNodeViewer")
+    viewer.name = "Numpy Viewer"
+    viewer.use_alpha = True
+    added.extend((render_layers, viewer))
+    nodes.active = viewer
+    if not any(node.type == "COMPOSITE" for node in nodes):
+        composite = nodes.new(type="CompositorNodeComposite")
+        added.append(composite)
+        scene.node_tree.links.new(
+            render_layers.outputs["Image"], composite.inputs["Image"]
+        )
+    return render_layers, viewer
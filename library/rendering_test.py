@@ -0,0 +1,86 @@
+import unittest
+import bpy
+import numpy as np
+
+from library.constructors.meshes import new_plane
+from library.constructors.cameras import new_camera
+from library.rendering import render_to_numpy, render_frames_to_numpy
+
+
+class TestRenderToNumpy(unittest.TestCase):
+    def setUp(self):
+        """
+        Make a small, quick to render, scene before each test.
+        """
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        scene = bpy.context.scene
+        scene.render.engine = "CYCLES"
+        scene.cycles.samples = 1
+        scene.render.resolution_x = 16
+        scene.render.resolution_y = 8
+        scene.render.resolution_percentage = 100
+        new_plane(location=(0, 0, 0), size=2, name="TestPlane")
+        new_camera((0, 0, 5), (0, 0, 0), "TestCamera")
+
+    def test_render_image(self):
+        """
+        Test that the image comes back as an RGBA array of the render size.
+        """
+        result = render_to_numpy()
+        self.assertEqual(list(result.keys()), ["Image"])
+        self.assertEqual(result["Image"].shape, (8, 16, 4))
+        self.assertEqual(result["Image"].dtype, np.float32)
+
+    def test_render_passes(self):
+        """
+        Test that extra passes come back with the right number of channels.
+        """
+        result = render_to_numpy(passes=("Depth", "Normal"))
+        self.assertEqual(result["Depth"].shape, (8, 16))
+        self.assertEqual(result["Normal"].shape, (8, 16, 3))
+        # The camera is 5 units above the plane, which faces it
+        self.assertAlmostEqual(float(result["Depth"][4, 8]), 5.0, places=2)
+        np.testing.assert_array_almost_equal(result["Normal"][4, 8], (0, 0, 1), 2)
+
+    def test_passes_packed(self):
+        """
+        Test that Depth and Normal share a render, and the scene is left as it was.
+        """
+        renders = []
+        handler = lambda scene, *args: renders.append(scene.render.use_persistent_data)
+        bpy.app.handlers.render_post.append(handler)
+        try:
+            render_to_numpy(passes=("Depth", "Normal"))
+        finally:
+            bpy.app.handlers.render_post.remove(handler)
+        self.assertEqual(renders, [True, True])
+        self.assertFalse(bpy.context.scene.render.use_persistent_data)
+        view_layer = bpy.context.scene.view_layers[0]
+        self.assertFalse(view_layer.use_pass_z)
+        self.assertFalse(view_layer.use_pass_normal)
+        self.assertFalse(bpy.context.scene.use_nodes)
+        self.assertEqual(
+            [n for n in bpy.context.scene.node_tree.nodes if "Numpy" in n.name], []
+        )
+
+    def test_unsupported_pass(self):
+        """
+        Test that an unknown pass name is rejected.
+        """
+        with self.assertRaises(ValueError):
+            render_to_numpy(passes=("Sparkle",))
+
+    def test_render_frames_callback(self):
+        """
+        Test that the callback gets each frame, and results are not kept.
+        """
+        seen = []
+        results = render_frames_to_numpy(
+            [1, 2], callback=lambda frame, result: seen.append(frame)
+        )
+        self.assertIsNone(results)
+        self.assertEqual(seen, [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
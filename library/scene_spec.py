@@ -0,0 +1,521 @@
+# Build scenes from a declarative specification (JSON or YAML)
+#
+# A spec is a dictionary of sections - 'render', 'terrain', 'camera',
+#  'backdrop', 'materials' and 'world' - each describing one part of the scene
+#  (see foothills/Louisville_view.json for an example).
+#
+# The spec a scene was built from is kept in the scene. Building again, with a
+#  changed spec, only rebuilds the sections that changed (and the sections built
+#  from the values that changed). Every datablock is tagged with the section that
+#  made it, so a section can be removed cleanly before it is rebuilt. Rebuilt
+#  objects are given their existing materials back.
+#
+# To build a scene from a spec file:
+#   blender --background --python library/scene_spec.py -- --spec my_scene.json
+
+import os
+import sys
+import json
+import math
+import argparse
+import bpy
+import numpy as np
+
+from library.utilities import set_render_filename
+from library.assets import AssetLoader, read_image_size
+from library.constructors.meshes import new_plane
+from library.constructors.cameras import new_camera
+from library.constructors.terrain import new_terrain, reduce_image
+from library.constructors.images import (
+    make_image_from_numpy,
+    make_numpy_from_image,
+    load_image,
+)
+from library.constructors.materials import (
+    new_image_material,
+    new_vertex_colour_material,
+)
+from library.constructors.colours import (
+    map_to_colours,
+    sample_grid_at_vertices,
+    set_vertex_colours,
+)
+from library.constructors.worlds import new_sky_world, new_colour_world
+
+# The sections of a spec, in build order
+SECTIONS = ("render", "terrain", "camera", "backdrop", "materials", "world")
+
+# The values, from other sections, that each section is built from - as
+#  (section, key, ...) paths. A section is rebuilt when its own values change,
+#  or one of these does.
+DEPENDS = {
+    "render": (),
+    "terrain": (
+        # The render size, if the terrain resolution isn't given
+        ("render", "resolution_x"),
+        ("render", "resolution_y"),
+        # The colour texture, counted in the memory budget
+        ("materials", "Terrain", "image"),
+    ),
+    "camera": (),
+    "backdrop": (
+        ("terrain", "horizontal_scale"),
+        ("terrain", "lat_range"),
+        ("camera", "rotation"),
+    ),
+    "materials": (),
+    "world": (),
+}
+
+# Sections that add to what another section makes (the camera adds the
+#  curvature modifier to the terrain), so are rebuilt whenever it is
+BUILT_ON = {"camera": ("terrain",)}
+
+# The datablock types a section can make
+ID_COLLECTIONS = (
+    "objects",
+    "meshes",
+    "cameras",
+    "lights",
+    "materials",
+    "images",
+    "textures",
+    "worlds",
+    "node_groups",
+)
+
+SPEC_PROPERTY = "scene_spec"
+SECTION_PROPERTY = "scene_spec_section"
+FILE_PROPERTY = "scene_spec_file"
+LEVEL_PROPERTY = "scene_spec_texture_level"
+
+
+def load_spec(path):
+    """
+    Loads a scene spec from a JSON or YAML file.
+
+    Parameters:
+    - path (str): The spec file (YAML if it ends in .yml or .yaml).
+
+    Returns:
+    - dict: The spec.
+    """
+    with open(path) as f:
+        if path.endswith((".yml", ".yaml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading YAML specs needs pyyaml installed")
+            return yaml.safe_load(f)
+        return json.load(f)
+
+
+def update_spec(spec, changes):
+    """
+    Makes a copy of a spec with some values changed (e.g. for a parameter sweep).
+
+    Parameters:
+    - spec (dict): The spec.
+    - changes (dict): New values, by section - e.g. {"camera": {"lens": 10}}.
+
+    Returns:
+    - dict: The changed spec (the original is not modified).
+    """
+    updated = json.loads(json.dumps(spec))
+    for section, values in changes.items():
+        updated[section] = dict(updated.get(section) or {}, **values)
+    return updated
+
+
+def changed_sections(spec, previous):
+    """
+    Finds the sections of a spec that need to be rebuilt.
+
+    Parameters:
+    - spec (dict): The new spec.
+    - previous (dict): The spec the scene was built from.
+
+    Returns:
+    - list: The sections to rebuild, in build order.
+    """
+    rebuild = []
+    for section in SECTIONS:
+        if (
+            spec.get(section) != previous.get(section)
+            or any(
+                _spec_value(spec, path) != _spec_value(previous, path)
+                for path in _dependencies(spec, section)
+            )
+            or any(built_on in rebuild for built_on in BUILT_ON.get(section, ()))
+        ):
+            rebuild.append(section)
+    return rebuild
+
+
+def _dependencies(spec, section):
+    if section == "terrain" and (spec.get("terrain") or {}).get("polygons"):
+        # The resolution is given, so doesn't depend on the render size
+        return [path for path in DEPENDS[section] if path[0] != "render"]
+    return DEPENDS[section]
+
+
+def _spec_value(spec, path):
+    # The value at a (section, key, ...) path - None if it isn't there
+    value = spec
+    for key in path:
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def build_scene(spec, base_dir=".", scene=None):
+    """
+    Builds (or updates) a scene from a spec.
+
+    Parameters:
+    - spec (dict): The spec.
+    - base_dir (str): The directory that file names in the spec are relative to.
+    - scene (bpy.types.Scene): The scene to build (default: the current scene).
+
+    Returns:
+    - list: The sections that were rebuilt.
+    """
+    if scene is None:
+        scene = bpy.context.scene
+    previous = json.loads(scene.get(SPEC_PROPERTY, "{}"))
+    rebuild = changed_sections(spec, previous)
+
+    for section in reversed(rebuild):
+        remove_section(section)
+    with AssetLoader() as loader:
+        # Start reading the files now, so it overlaps with building the geometry
+        loader.request(*_spec_files(spec, base_dir, rebuild))
+        for section in rebuild:
+            if spec.get(section) is None:
+                continue
+            before = _all_ids()
+            BUILDERS[section](spec, base_dir, scene, loader)
+            for id_block in _all_ids().values():
+                if id_block.as_pointer() not in before:
+                    id_block[SECTION_PROPERTY] = section
+        if "materials" not in rebuild and spec.get("materials"):
+            _reassign_materials(spec, base_dir, loader, rebuild)
+
+    scene[SPEC_PROPERTY] = json.dumps(spec, sort_keys=True)
+    return rebuild
+
+
+def remove_section(section):
+    """
+    Removes everything a spec section made from the scene.
+
+    Parameters:
+    - section (str): The section.
+    """
+    if section == "camera" and "Terrain" in bpy.data.objects:
+        # The camera section adds the curvature modifier to the terrain
+        terrain = bpy.data.objects["Terrain"]
+        if "Dropoff" in terrain.modifiers:
+            terrain.modifiers.remove(terrain.modifiers["Dropoff"])
+    tagged = [
+        id_block
+        for id_block in _all_ids().values()
+        if id_block.get(SECTION_PROPERTY) == section
+    ]
+    bpy.data.batch_remove(tagged)
+
+
+def _all_ids():
+    ids = {}
+    for collection in ID_COLLECTIONS:
+        for id_block in getattr(bpy.data, collection):
+            ids[id_block.as_pointer()] = id_block
+    return ids
+
+
+def _path(base_dir, name):
+    return os.path.join(base_dir, name)
+
+
+def _spec_files(spec, base_dir, sections):
+    # The image files the sections will need, in the order they are needed
+    files = []
+    if "terrain" in sections and spec.get("terrain"):
+        files.append(_path(base_dir, spec["terrain"]["dem"]))
+        files.extend(_path(base_dir, name) for name in _terrain_textures(spec))
+    if "materials" in sections and spec.get("materials"):
+        for material_spec in spec["materials"].values():
+            if "image" in material_spec:
+                files.append(_path(base_dir, material_spec["image"]))
+    return files
+
+
+def _terrain_textures(spec):
+    # The images used on the terrain (by its material)
+    material_spec = (spec.get("materials") or {}).get("Terrain") or {}
+    return [material_spec["image"]] if "image" in material_spec else []
+
+
+def _texture_image(base_dir, name, loader, texture_level=0):
+    # A texture image, loaded once for each texture level - materials share it
+    path = os.path.abspath(_path(base_dir, name))
+    for img in bpy.data.images:
+        if img.get(FILE_PROPERTY) == path and img.get(LEVEL_PROPERTY) == texture_level:
+            return img
+    img = loader.image(path)
+    if img.get(FILE_PROPERTY) == path:
+        # Kept by the image cache, and already used at another level
+        img = load_image(path, cache=False)
+    reduce_image(img, texture_level)
+    img[FILE_PROPERTY] = path
+    img[LEVEL_PROPERTY] = texture_level
+    return img
+
+
+def _texture_size(base_dir, name, loader):
+    # The (width, height, is_float) size of a texture image - from the file's
+    #  header if possible, so its pixels aren't needed until its material is made
+    size = read_image_size(_path(base_dir, name))
+    if size is None:
+        img = _texture_image(base_dir, name, loader)
+        size = (img.size[0], img.size[1], img.is_float)
+    return size
+
+
+def _texture_level(name):
+    # The reduction of an object's texture images (see new_terrain)
+    obj = bpy.data.objects.get(name)
+    return 0 if obj is None else obj.get("texture_level", 0)
+
+
+def _terrain_heights(terrain):
+    # The height array used to displace the terrain
+    img = terrain.modifiers["Displacement"].texture.image
+    return make_numpy_from_image(img)[:, :, 0]
+
+
+def _view_fractions(spec):
+    # Position of the viewpoint as fractions of the terrain lat and lon range
+    terrain_spec = spec["terrain"]
+    camera_spec = spec["camera"]
+    lat_range = terrain_spec["lat_range"]
+    lon_range = terrain_spec["lon_range"]
+    lat_fraction = (camera_spec["lat"] - lat_range[0]) / (lat_range[1] - lat_range[0])
+    lon_fraction = (camera_spec["lon"] - lon_range[0]) / (lon_range[1] - lon_range[0])
+    return lat_fraction, lon_fraction
+
+
+def _build_render(spec, base_dir, scene, loader):
+    render_spec = spec["render"]
+    if "filename" in render_spec:
+        set_render_filename(_path(base_dir, render_spec["filename"]), relative=False)
+    scene.render.resolution_x = render_spec.get("resolution_x", 1920)
+    scene.render.resolution_y = render_spec.get("resolution_y", 1080)
+    scene.render.resolution_percentage = render_spec.get("percentage", 100)
+    if "engine" in render_spec:
+        scene.render.engine = render_spec["engine"]
+    if "samples" in render_spec:
+        if scene.render.engine == "CYCLES":
+            scene.cycles.samples = render_spec["samples"]
+        else:
+            scene.eevee.taa_render_samples = render_spec["samples"]
+
+
+def _build_terrain(spec, base_dir, scene, loader):
+    terrain_spec = spec["terrain"]
+    # The textures count in (and may be reduced to fit) the memory budget, but
+    #  only their sizes are needed here - their material loads them
+    texture_sizes = [
+        _texture_size(base_dir, name, loader) for name in _terrain_textures(spec)
+    ]
+    heights = loader.image(_path(base_dir, terrain_spec["dem"]))
+    terrain = new_terrain(
+        heights,
+        name="Terrain",
+        size=terrain_spec["horizontal_scale"],
+        vertical_scale=terrain_spec["vertical_scale"],
+        rotation=(0.0, 0.0, math.radians(90)),  # West is left
+        polygons=terrain_spec.get("polygons"),
+        memory_budget=terrain_spec.get("memory_budget"),
+        triangle_budget=terrain_spec.get("triangle_budget"),
+        render_resolution=(scene.render.resolution_x, scene.render.resolution_y),
+        max_polygons=terrain_spec.get("max_polygons"),
+        texture_sizes=texture_sizes,
+    )
+    # Scale from geographic projection to (approximately) actual shape
+    terrain.scale.x = math.cos(math.radians(np.mean(terrain_spec["lat_range"])))
+
+
+def _build_camera(spec, base_dir, scene, loader):
+    terrain_spec = spec["terrain"]
+    camera_spec = spec["camera"]
+    terrain = bpy.data.objects["Terrain"]
+    horizontal_scale = terrain_spec["horizontal_scale"]
+    vertical_scale = terrain_spec["vertical_scale"]
+
+    # Put the camera above the ground at the viewpoint (the terrain is rotated,
+    #  so latitude is along x and longitude along y)
+    heights = _terrain_heights(terrain)
+    lat_fraction, lon_fraction = _view_fractions(spec)
+    view_height = heights[
+        min(int(heights.shape[0] * lat_fraction), heights.shape[0] - 1),
+        min(int(heights.shape[1] * lon_fraction), heights.shape[1] - 1),
+    ]
+    camera_location = (
+        horizontal_scale * (lat_fraction - 0.5) * terrain.scale.x,
+        horizontal_scale * (lon_fraction - 0.5),
+        view_height * vertical_scale + camera_spec["height_above_ground"],
+    )
+    new_camera(
+        camera_location,
+        [math.radians(angle) for angle in camera_spec["rotation"]],
+        "Camera",
+        lens=camera_spec.get("lens", 50),
+        active=True,
+    )
+
+    # Drop the terrain with the curvature of the Earth, away from the viewpoint
+    polygons = terrain["polygons"]
+    grid_lats = np.linspace(*terrain_spec["lat_range"], polygons)
+    grid_lons = np.linspace(*terrain_spec["lon_range"], polygons)
+    grid_lats, grid_lons = np.meshgrid(grid_lats, grid_lons)
+    grid_lats -= camera_spec["lat"]
+    grid_lons -= camera_spec["lon"]
+    distance = np.sqrt(grid_lats**2 + (grid_lons * terrain.scale.x) ** 2) * 111.111
+    dropoff = 6371 - np.sqrt(6371**2 - distance**2)  # km
+    dropoff = np.maximum(0, dropoff)
+    dropoff = dropoff / 233.000  # Empirical scale km to terrain units
+    dropoff = dropoff.T  # Transpose to match Blender's UV coordinates
+    dropoff_scale = np.max(dropoff)
+    dropoff_img = make_image_from_numpy(dropoff, name="Dropoff", rescale=True)
+    displace_modifier = terrain.modifiers.new(name="Dropoff", type="DISPLACE")
+    displace_modifier.strength = -vertical_scale * dropoff_scale
+    displace_modifier.direction = "Z"
+    displace_modifier.mid_level = 0.0
+    displace_modifier.texture_coords = "UV"
+    displace_modifier.texture = bpy.data.textures.new(name="Dropoff", type="IMAGE")
+    displace_modifier.texture.extension = "EXTEND"
+    displace_modifier.texture.image = dropoff_img
+
+
+def _build_backdrop(spec, base_dir, scene, loader):
+    backdrop_spec = spec["backdrop"]
+    horizontal_scale = spec["terrain"]["horizontal_scale"]
+    terrain = bpy.data.objects["Terrain"]
+    scale = backdrop_spec.get("scale", (6.0, 0.75))
+    backdrop = new_plane(
+        location=(
+            0.0,
+            -terrain.scale.x * horizontal_scale / 2,
+            scale[1] * horizontal_scale / 2,
+        ),
+        size=horizontal_scale,
+        name="Backdrop",
+        # Perpendicular to camera angle
+        rotation=(math.pi * 2 - math.radians(spec["camera"]["rotation"][0]), 0, 0),
+    )
+    backdrop.scale.x = scale[0]
+    backdrop.scale.y = scale[1]
+
+
+def _build_materials(spec, base_dir, scene, loader):
+    for name, material_spec in spec["materials"].items():
+        obj = bpy.data.objects[name]
+        if "image" in material_spec:
+            material = new_image_material(
+                name,
+                _texture_image(
+                    base_dir, material_spec["image"], loader, _texture_level(name)
+                ),
+                rotation=math.radians(material_spec.get("rotation", 0.0)),
+                roughness=material_spec.get("roughness", 0.5),
+                metallic=material_spec.get("metallic", 0.0),
+            )
+        elif "colormap" in material_spec:
+            material = new_vertex_colour_material(
+                name,
+                roughness=material_spec.get("roughness", 0.5),
+                metallic=material_spec.get("metallic", 0.0),
+            )
+        else:
+            raise ValueError("Material %s needs an image or a colormap" % name)
+        _assign_material(obj, material, material_spec)
+
+
+def _assign_material(obj, material, material_spec):
+    if "colormap" in material_spec:
+        # Colour the vertices by height
+        values = sample_grid_at_vertices(obj.data, _terrain_heights(obj))
+        colours = map_to_colours(
+            values,
+            material_spec["colormap"],
+            vmin=material_spec.get("vmin"),
+            vmax=material_spec.get("vmax"),
+        )
+        set_vertex_colours(obj, colours)
+    obj.data.materials.clear()
+    obj.data.materials.append(material)
+
+
+def _reassign_materials(spec, base_dir, loader, rebuilt):
+    # Give rebuilt objects their (unchanged) materials back
+    for name, material_spec in spec["materials"].items():
+        obj = bpy.data.objects.get(name)
+        material = bpy.data.materials.get(name)
+        if (
+            obj is None
+            or obj.get(SECTION_PROPERTY) not in rebuilt
+            or material is None
+            or material.get(SECTION_PROPERTY) != "materials"
+        ):
+            continue
+        if "image" in material_spec:
+            # The rebuilt object may need its image at another texture level
+            for node in material.node_tree.nodes:
+                if node.type == "TEX_IMAGE":
+                    previous = node.image
+                    node.image = _texture_image(
+                        base_dir, material_spec["image"], loader, _texture_level(name)
+                    )
+                    if previous not in (None, node.image) and previous.users == 0:
+                        bpy.data.images.remove(previous)
+        _assign_material(obj, material, material_spec)
+
+
+def _build_world(spec, base_dir, scene, loader):
+    world_spec = spec["world"]
+    if world_spec.get("sky", False):
+        new_sky_world("Sky", strength=world_spec.get("strength", 1.0))
+    else:
+        new_colour_world(
+            "Background",
+            colour=world_spec.get("colour", (0.7, 0.7, 0.7, 1.0)),
+            strength=world_spec.get("strength", 1.0),
+        )
+
+
+BUILDERS = {
+    "render": _build_render,
+    "terrain": _build_terrain,
+    "camera": _build_camera,
+    "backdrop": _build_backdrop,
+    "materials": _build_materials,
+    "world": _build_world,
+}
+
+
+if __name__ == "__main__":
+    # Blender passes the arguments after '--' on to the script
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Build a scene from a spec")
+    parser.add_argument(
+        "--spec", help="Spec file (JSON or YAML)", type=str, required=True
+    )
+    args = parser.parse_args(argv)
+    if SPEC_PROPERTY not in bpy.context.scene:
+        # Not built from a spec before - start from an empty scene
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+    build_scene(
+        load_spec(args.spec), base_dir=os.path.dirname(os.path.abspath(args.spec))
+    )
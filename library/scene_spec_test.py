@@ -0,0 +1,224 @@
+import unittest
+import os
+import tempfile
+import bpy
+import numpy as np
+
+from library.constructors.images import make_image_from_numpy
+from library.scene_spec import (
+    changed_sections,
+    update_spec,
+    build_scene,
+    SECTION_PROPERTY,
+)
+
+
+def make_spec(dem):
+    return {
+        "render": {"resolution_x": 64, "resolution_y": 32},
+        "terrain": {
+            "dem": dem,
+            "lat_range": [39.5, 40.5],
+            "lon_range": [-106.0, -105.0],
+            "horizontal_scale": 10.0,
+            "vertical_scale": 1.0,
+            "polygons": 16,
+        },
+        "camera": {
+            "lat": 40.0,
+            "lon": -105.5,
+            "height_above_ground": 0.1,
+            "rotation": [104, 0, 180],
+            "lens": 5.0,
+        },
+        "backdrop": {"scale": [6.0, 0.75]},
+        "materials": {"Terrain": {"colormap": [[0, 0, 0], [1, 1, 1]]}},
+        "world": {"sky": True},
+    }
+
+
+class TestChangedSections(unittest.TestCase):
+    def test_nothing_changed(self):
+        spec = make_spec("dem.exr")
+        self.assertEqual(changed_sections(spec, spec), [])
+
+    def test_first_build(self):
+        spec = make_spec("dem.exr")
+        self.assertEqual(
+            changed_sections(spec, {}),
+            ["render", "terrain", "camera", "backdrop", "materials", "world"],
+        )
+
+    def test_dependencies(self):
+        """
+        Test that sections depending on a changed section are rebuilt too.
+        """
+        spec = make_spec("dem.exr")
+        changed = update_spec(spec, {"camera": {"lens": 10.0}})
+        self.assertEqual(changed_sections(changed, spec), ["camera"])
+        changed = update_spec(spec, {"camera": {"rotation": [100, 0, 180]}})
+        self.assertEqual(changed_sections(changed, spec), ["camera", "backdrop"])
+        changed = update_spec(spec, {"terrain": {"polygons": 32}})
+        self.assertEqual(changed_sections(changed, spec), ["terrain", "camera"])
+        changed = update_spec(spec, {"world": {"sky": False}})
+        self.assertEqual(changed_sections(changed, spec), ["world"])
+
+    def test_render_settings(self):
+        """
+        Test that render settings other than the size don't rebuild the terrain.
+        """
+        spec = make_spec("dem.exr")
+        changed = update_spec(spec, {"render": {"filename": "other"}})
+        self.assertEqual(changed_sections(changed, spec), ["render"])
+        changed = update_spec(spec, {"render": {"samples": 4, "engine": "CYCLES"}})
+        self.assertEqual(changed_sections(changed, spec), ["render"])
+        # The render size only matters if the terrain resolution isn't given
+        changed = update_spec(spec, {"render": {"resolution_x": 128}})
+        self.assertEqual(changed_sections(changed, spec), ["render"])
+        spec = update_spec(spec, {"terrain": {"polygons": None}})
+        changed = update_spec(spec, {"render": {"resolution_x": 128}})
+        self.assertEqual(
+            changed_sections(changed, spec), ["render", "terrain", "camera"]
+        )
+
+    def test_update_spec_copies(self):
+        spec = make_spec("dem.exr")
+        changed = update_spec(spec, {"camera": {"lens": 10.0}})
+        self.assertEqual(spec["camera"]["lens"], 5.0)
+        self.assertEqual(changed["camera"]["lens"], 10.0)
+        self.assertEqual(changed["camera"]["lat"], 40.0)
+
+
+class TestBuildScene(unittest.TestCase):
+    def setUp(self):
+        """
+        Start from an empty scene, with a synthetic DEM file.
+        """
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        self.directory = tempfile.TemporaryDirectory()
+        dem = make_image_from_numpy(
+            np.random.rand(32, 32), name="DEM", float_buffer=True
+        )
+        dem.filepath_raw = os.path.join(self.directory.name, "dem.exr")
+        dem.file_format = "OPEN_EXR"
+        dem.save()
+        bpy.data.images.remove(dem)
+        self.spec = make_spec("dem.exr")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_build(self):
+        rebuilt = build_scene(self.spec, base_dir=self.directory.name)
+        self.assertEqual(len(rebuilt), 6)
+        terrain = bpy.data.objects["Terrain"]
+        self.assertEqual(len(terrain.data.polygons), 16 * 16)
+        self.assertTrue("Dropoff" in terrain.modifiers)
+        self.assertEqual(bpy.context.scene.camera.name, "Camera")
+        self.assertEqual(bpy.context.scene.world.name, "Sky")
+        self.assertEqual(terrain.data.materials[0].name, "Terrain")
+        self.assertEqual(terrain[SECTION_PROPERTY], "terrain")
+
+    def test_incremental_build(self):
+        """
+        Test that only the changed parts of the scene are rebuilt.
+        """
+        build_scene(self.spec, base_dir=self.directory.name)
+        terrain_mesh = bpy.data.objects["Terrain"].data.as_pointer()
+        camera = bpy.context.scene.camera
+        changed = update_spec(self.spec, {"world": {"sky": False}})
+        self.assertEqual(build_scene(changed, base_dir=self.directory.name), ["world"])
+        self.assertEqual(bpy.context.scene.world.name, "Background")
+        self.assertEqual(len(bpy.data.worlds), 1)
+        self.assertEqual(bpy.context.scene.camera, camera)
+
+        changed = update_spec(changed, {"camera": {"lens": 10.0}})
+        build_scene(changed, base_dir=self.directory.name)
+        self.assertEqual(bpy.context.scene.camera.data.lens, 10.0)
+        self.assertEqual(len(bpy.data.cameras), 1)
+        terrain = bpy.data.objects["Terrain"]
+        self.assertEqual(terrain.data.as_pointer(), terrain_mesh)
+        self.assertEqual(len([m for m in terrain.modifiers if m.name == "Dropoff"]), 1)
+
+    def test_material_kept(self):
+        """
+        Test that a rebuilt object gets its material back, without it being rebuilt.
+        """
+        build_scene(self.spec, base_dir=self.directory.name)
+        material = bpy.data.objects["Terrain"].data.materials[0].as_pointer()
+        changed = update_spec(self.spec, {"terrain": {"polygons": 8}})
+        self.assertEqual(
+            build_scene(changed, base_dir=self.directory.name), ["terrain", "camera"]
+        )
+        terrain = bpy.data.objects["Terrain"]
+        self.assertEqual(len(terrain.data.polygons), 8 * 8)
+        self.assertEqual(terrain.data.materials[0].as_pointer(), material)
+        self.assertTrue("Colour" in terrain.data.color_attributes)
+
+    def test_terrain_texture(self):
+        """
+        Test that the terrain texture is counted in its memory estimate, and shared.
+        """
+        build_scene(self.spec, base_dir=self.directory.name)
+        without_texture = bpy.data.objects["Terrain"]["memory_estimate"]
+        texture = make_image_from_numpy(np.random.rand(64, 64, 3), name="Texture")
+        texture.filepath_raw = os.path.join(self.directory.name, "texture.png")
+        texture.file_format = "PNG"
+        texture.save()
+        bpy.data.images.remove(texture)
+        changed = update_spec(
+            self.spec, {"materials": {"Terrain": {"image": "texture.png"}}}
+        )
+        changed["materials"]["Terrain"].pop("colormap")
+        self.assertEqual(
+            build_scene(changed, base_dir=self.directory.name),
+            ["terrain", "camera", "materials"],
+        )
+        terrain = bpy.data.objects["Terrain"]
+        self.assertEqual(terrain["memory_estimate"] - without_texture, 2 * 64 * 64 * 4)
+        textures = [img for img in bpy.data.images if img.size[0] == 64]
+        self.assertEqual(len(textures), 1)
+        node = terrain.data.materials[0].node_tree.nodes["Image Texture"]
+        self.assertEqual(node.image, textures[0])
+
+    def test_texture_reduced(self):
+        """
+        Test that the terrain texture is reduced to fit the terrain's memory budget,
+        and reloaded when the budget changes.
+        """
+        texture = make_image_from_numpy(np.random.rand(256, 256, 3), name="Texture")
+        texture.filepath_raw = os.path.join(self.directory.name, "texture.png")
+        texture.file_format = "PNG"
+        texture.save()
+        bpy.data.images.remove(texture)
+        spec = update_spec(
+            self.spec,
+            {
+                "terrain": {"polygons": None, "memory_budget": 2 * 10**5},
+                "materials": {"Terrain": {"image": "texture.png"}},
+            },
+        )
+        spec["materials"]["Terrain"].pop("colormap")
+        build_scene(spec, base_dir=self.directory.name)
+        terrain = bpy.data.objects["Terrain"]
+        level = terrain["texture_level"]
+        self.assertGreater(level, 0)
+        self.assertLessEqual(terrain["memory_estimate"], 2 * 10**5)
+        node = terrain.data.materials[0].node_tree.nodes["Image Texture"]
+        self.assertEqual(node.image.size[0], 256 >> level)
+        # A bigger budget, so the texture isn't reduced (the material is kept)
+        changed = update_spec(spec, {"terrain": {"memory_budget": 10**8}})
+        self.assertEqual(
+            build_scene(changed, base_dir=self.directory.name), ["terrain", "camera"]
+        )
+        self.assertEqual(bpy.data.objects["Terrain"]["texture_level"], 0)
+        self.assertEqual(node.image.size[0], 256)
+        self.assertEqual(len(bpy.data.images), 2)  # The DEM and the texture
+
+    def test_nothing_changed(self):
+        build_scene(self.spec, base_dir=self.directory.name)
+        self.assertEqual(build_scene(self.spec, base_dir=self.directory.name), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,9 @@
 # Utility functions for Blender scripts
 
 import os
+import sys
 import bpy
+import numpy as np
 
 
 # Set the render file name root - this is where the rendered images will be saved
@@ -19,3 +21,104 @@ def set_render_filename(name, relative=True):
         bpy.context.scene.render.filepath = os.path.join(bindir, "%s_" % name)
     else:
         bpy.context.scene.render.filepath = "%s_" % name
+
+
+def sample_grid(arr, u, v):
+    """
+    Bilinearly sample a 2D array at fractional (u, v) coordinates.
+
+    Uses the same conventions as an image texture with 'EXTEND' extension:
+    u runs along the columns and v along the rows, both from 0 to 1, and
+    samples outside the array take the value of the nearest edge.
+
+    Parameters:
+    - arr (numpy.ndarray): The 2D array to sample.
+    - u (numpy.ndarray): The horizontal coordinates (0-1).
+    - v (numpy.ndarray): The vertical coordinates (0-1).
+
+    Returns:
+    - numpy.ndarray: The sampled values, same shape as u.
+    """
+    arr = np.asarray(arr)
+    # Pixel centres are at (i+0.5)/n
+    x = np.clip(np.asarray(u) * arr.shape[1] - 0.5, 0, arr.shape[1] - 1)
+    y = np.clip(np.asarray(v) * arr.shape[0] - 0.5, 0, arr.shape[0] - 1)
+    x0 = np.minimum(x.astype(np.int64), max(arr.shape[1] - 2, 0))
+    y0 = np.minimum(y.astype(np.int64), max(arr.shape[0] - 2, 0))
+    x1 = np.minimum(x0 + 1, arr.shape[1] - 1)
+    y1 = np.minimum(y0 + 1, arr.shape[0] - 1)
+    wx = x - x0
+    wy = y - y0
+    return (arr[y0, x0] * (1 - wx) + arr[y0, x1] * wx) * (1 - wy) + (
+        arr[y1, x0] * (1 - wx) + arr[y1, x1] * wx
+    ) * wy
+
+
+def get_vertex_coordinates(mesh):
+    """
+    Get the (local) coordinates of all the vertices of a mesh.
+
+    Parameters:
+    - mesh (bpy.types.Mesh): The mesh.
+
+    Returns:
+    - numpy.ndarray: The coordinates, shape (n_vertices, 3), float32.
+    """
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    return co.reshape((-1, 3))
+
+
+def get_xy_bounds(co):
+    """
+    Get the horizontal extent of a mesh (e.g. a grid made by new_grid).
+
+    Parameters:
+    - co (numpy.ndarray): The coordinates of the vertices of the mesh,
+                          shape (n_vertices, 3) (see get_vertex_coordinates).
+
+    Returns:
+    - tuple: (lower, extent) - numpy arrays of the minimum (x, y) coordinates
+             and the (x, y) size of the mesh, in local coordinates.
+    """
+    lower = co[:, :2].min(axis=0)
+    extent = np.maximum(co[:, :2].max(axis=0) - lower, np.finfo(np.float32).tiny)
+    return lower, extent
+
+
+def get_peak_memory():
+    """
+    Gets the peak memory use of this process so far.
+
+    This is the highest use over the whole life of the process - in a long-running
+    process (e.g. the worker), it may be from an earlier job. See
+    get_current_memory for the use now.
+
+    Returns:
+    - int: The peak resident memory, in bytes (None if it can't be found).
+    """
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+def get_current_memory():
+    """
+    Gets the current memory use of this process.
+
+    Returns:
+    - int: The resident memory, in bytes (None if it can't be found - it is
+           read from /proc, so only on Linux).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
@@ -1,9 +1,15 @@
 import unittest
 import os
 import bpy
+import numpy as np
 
 # Assuming library.utilities is the correct path
-from library.utilities import set_render_filename
+from library.utilities import (
+    set_render_filename,
+    sample_grid,
+    get_peak_memory,
+    get_current_memory,
+)
 
 
 class TestSetRenderFilename(unittest.TestCase):
@@ -41,5 +47,40 @@ class TestSetRenderFilename(unittest.TestCase):
         self.assertEqual(bpy.context.scene.render.filepath, test_path + "_")
 
 
+class TestSampleGrid(unittest.TestCase):
+    def test_pixel_centres(self):
+        """
+        Test that sampling at pixel centres returns the pixel values.
+        """
+        arr = np.array([[0.0, 1.0], [2.0, 3.0]])
+        values = sample_grid(
+            arr, np.array([0.25, 0.75, 0.25]), np.array([0.25, 0.25, 0.75])
+        )
+        np.testing.assert_array_almost_equal(values, [0.0, 1.0, 2.0])
+
+    def test_interpolation_and_edges(self):
+        """
+        Test bilinear interpolation, and extension beyond the edges.
+        """
+        arr = np.array([[0.0, 1.0], [2.0, 3.0]])
+        values = sample_grid(arr, np.array([0.5, 0.0, 1.0]), np.array([0.5, 0.0, 1.0]))
+        np.testing.assert_array_almost_equal(values, [1.5, 0.0, 3.0])
+
+
+class TestMemory(unittest.TestCase):
+    @unittest.skipIf(not os.path.exists("/proc/self/statm"), "Needs /proc")
+    def test_current_memory(self):
+        """
+        Test that the current use goes up and down, below the process peak.
+        """
+        before = get_current_memory()
+        block = np.ones(64 * 1024**2, dtype=np.uint8)
+        during = get_current_memory()
+        del block
+        self.assertGreater(during - before, 32 * 1024**2)
+        self.assertLess(get_current_memory(), during)
+        self.assertLessEqual(during, get_peak_memory())
+
+
 if __name__ == "__main__":
     unittest.main()
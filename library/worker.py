@@ -0,0 +1,327 @@
+# A long-running Blender process that runs scene build/render jobs from a queue
+#
+# Starting Blender, and loading the DEM and textures, takes longer than many
+#  preview jobs. This worker starts once, and then runs each job (a script and
+#  its parameters) in the same process - resetting only the scene in between.
+#  The worker turns on load_image caching (library.constructors.images), and
+#  keeps the loaded images when it resets the scene, so later jobs don't have
+#  to read them from disc again.
+#
+# Start the worker with:
+#   blender --background --python library/worker.py -- --queue /path/to/queue
+#
+# Then submit jobs (from any python, bpy not needed) with submit_job, and get
+#  the results with wait_for_job.
+#
+# The queue is a directory, with a sub-directory for each job state. A job is a
+#  JSON file, which moves from 'incoming', to 'running', to 'done' or 'failed'.
+#  Moving the file claims the job, so several workers can share a queue. The
+#  claiming worker records itself (host and process id) in the job, so when a
+#  worker starts it can fail the jobs left running by a worker that has died.
+
+import os
+import sys
+import time
+import json
+import uuid
+import socket
+import runpy
+import argparse
+import traceback
+
+STATES = ("incoming", "running", "done", "failed")
+
+# The data removed between jobs (except the images kept by load_image)
+RESET_COLLECTIONS = (
+    "objects",
+    "meshes",
+    "curves",
+    "hair_curves",
+    "pointclouds",
+    "volumes",
+    "metaballs",
+    "lattices",
+    "fonts",
+    "cameras",
+    "lights",
+    "materials",
+    "textures",
+    "images",
+    "worlds",
+    "node_groups",
+    "collections",
+    "actions",
+    "particles",
+)
+
+
+def _make_queue(queue_dir):
+    for state in STATES:
+        os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+
+
+def _write_json(path, content):
+    # Write via a temporary file, so readers never see a partial job
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(content, f, indent=1)
+    os.replace(temporary, path)
+
+
+def submit_job(queue_dir, script, params=None, render=False, reset=True):
+    """
+    Adds a job to the queue.
+
+    Parameters:
+    - queue_dir (str): The queue directory.
+    - script (str): The scene script to run.
+    - params (dict): Parameters for the script (available to it as 'job_params').
+    - render (bool): If True, render the scene (to the render filepath) after the
+                     script has run.
+    - reset (bool): If False, don't reset the scene before running the script -
+                    so it can update the scene left by the previous job (e.g. a
+                    scene built from a spec, see library.scene_spec).
+
+    Returns:
+    - str: The job id.
+    """
+    _make_queue(queue_dir)
+    job_id = "%.6f_%s" % (time.time(), uuid.uuid4().hex[:8])
+    job = {
+        "id": job_id,
+        "script": os.path.abspath(script),
+        "params": params or {},
+        "render": render,
+        "reset": reset,
+        "submitted": time.time(),
+    }
+    _write_json(os.path.join(queue_dir, "incoming", job_id + ".json"), job)
+    return job_id
+
+
+def wait_for_job(queue_dir, job_id, timeout=None, poll_interval=0.1):
+    """
+    Waits for a job to finish.
+
+    Parameters:
+    - queue_dir (str): The queue directory.
+    - job_id (str): The job id (from submit_job).
+    - timeout (float): The maximum time to wait, in seconds (default: forever).
+    - poll_interval (float): How often to check, in seconds.
+
+    Returns:
+    - dict: The finished job - including 'status' ('done' or 'failed'), 'latency'
+            (timings in seconds), and 'error' (if failed).
+    """
+    start = time.time()
+    while True:
+        for state in ("done", "failed"):
+            path = os.path.join(queue_dir, state, job_id + ".json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    return json.load(f)
+        if timeout is not None and time.time() - start > timeout:
+            raise TimeoutError("Job %s not finished after %s s" % (job_id, timeout))
+        time.sleep(poll_interval)
+
+
+def _claim_job(queue_dir):
+    # Take the oldest incoming job - returns None if there isn't one
+    incoming = os.path.join(queue_dir, "incoming")
+    for name in sorted(f for f in os.listdir(incoming) if f.endswith(".json")):
+        running = os.path.join(queue_dir, "running", name)
+        try:
+            os.rename(os.path.join(incoming, name), running)
+        except FileNotFoundError:  # Another worker got there first
+            continue
+        with open(running) as f:
+            job = json.load(f)
+        job["worker"] = {"host": socket.gethostname(), "pid": os.getpid()}
+        _write_json(running, job)
+        return job
+    return None
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Running, as another user
+        return True
+    return True
+
+
+def recover_jobs(queue_dir):
+    """
+    Fails the running jobs whose worker (on this host) has stopped.
+
+    Jobs claimed by workers on other hosts are left alone, as they can't be
+    checked from here.
+
+    Parameters:
+    - queue_dir (str): The queue directory.
+
+    Returns:
+    - list: The ids of the jobs failed.
+    """
+    _make_queue(queue_dir)
+    running = os.path.join(queue_dir, "running")
+    failed = []
+    for name in sorted(f for f in os.listdir(running) if f.endswith(".json")):
+        path = os.path.join(running, name)
+        try:
+            with open(path) as f:
+                job = json.load(f)
+        except (FileNotFoundError, ValueError):  # Finished, or being written
+            continue
+        worker = job.get("worker")
+        if (
+            worker is None
+            or worker["host"] != socket.gethostname()
+            or _is_running(worker["pid"])
+        ):
+            continue
+        job["status"] = "failed"
+        job["error"] = "Worker %d stopped while running the job" % worker["pid"]
+        _write_json(os.path.join(queue_dir, "failed", name), job)
+        os.remove(path)
+        failed.append(job["id"])
+    return failed
+
+
+def reset_scene():
+    """
+    Empties the scene, ready for the next job.
+
+    Removes the objects and data made by earlier jobs, the scene's custom
+    properties, any other scenes, and the (non-persistent) handlers added by
+    scripts - but keeps the images kept by load_image, so they can be re-used.
+    This is much quicker than reloading the factory settings. Render settings
+    are left as the last job set them, so jobs should set those they need.
+    """
+    import bpy
+    from library.constructors.images import cached_images
+
+    scene = bpy.context.scene
+    kept = {img.as_pointer() for img in cached_images()}
+    removed = [other for other in bpy.data.scenes if other != scene]
+    for collection in RESET_COLLECTIONS:
+        removed += [
+            id_block
+            for id_block in getattr(bpy.data, collection)
+            if id_block.as_pointer() not in kept
+        ]
+    bpy.data.batch_remove(removed)
+    for key in list(scene.keys()):
+        del scene[key]
+    for name in dir(bpy.app.handlers):
+        handlers = getattr(bpy.app.handlers, name)
+        if isinstance(handlers, list):
+            for handler in list(handlers):
+                if not hasattr(handler, "_bpy_persistent"):
+                    handlers.remove(handler)
+
+
+def run_job(job):
+    """
+    Runs a job in this process.
+
+    Parameters:
+    - job (dict): The job (as made by submit_job).
+
+    Returns:
+    - dict: The job, with 'status', 'latency', 'memory' (the process's current
+            use, in bytes, before and after the job), and (if it failed) 'error'
+            added.
+    """
+    import bpy
+    from library.utilities import get_current_memory
+
+    memory_before = get_current_memory()
+    started = time.time()
+    try:
+        if job.get("reset", True):
+            reset_scene()
+        reset_done = time.time()
+        runpy.run_path(
+            job["script"],
+            init_globals={"job_params": job["params"]},
+            run_name="__main__",
+        )
+        built = time.time()
+        if job.get("render"):
+            bpy.ops.render.render(write_still=True)
+        job["status"] = "done"
+    except (Exception, SystemExit):  # A script calling sys.exit() fails its job
+        job["status"] = "failed"
+        job["error"] = traceback.format_exc()
+    finished = time.time()
+    job["memory"] = {"before": memory_before, "after": get_current_memory()}
+    job["latency"] = {
+        "queued": started - job["submitted"],
+        "run": finished - started,
+        "total": finished - job["submitted"],
+    }
+    if job["status"] == "done":
+        job["latency"].update(
+            {
+                "reset": reset_done - started,
+                "build": built - reset_done,
+                "render": finished - built,
+            }
+        )
+    return job
+
+
+def serve(queue_dir, poll_interval=0.1, max_jobs=None):
+    """
+    Runs jobs from the queue, until stopped (or max_jobs have been run).
+
+    First fails any jobs left running by a worker that has stopped (see
+    recover_jobs), so nothing waits for them forever.
+
+    Parameters:
+    - queue_dir (str): The queue directory.
+    - poll_interval (float): How often to check for new jobs, in seconds.
+    - max_jobs (int): Stop after this many jobs (default: never stop).
+    """
+    from library.constructors.images import set_image_caching
+
+    # Keep the pixels of loaded images, for later jobs
+    set_image_caching(True)
+    for job_id in recover_jobs(queue_dir):
+        print("Job %s failed: its worker stopped" % job_id)
+    jobs_run = 0
+    while max_jobs is None or jobs_run < max_jobs:
+        job = _claim_job(queue_dir)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        job = run_job(job)
+        _write_json(os.path.join(queue_dir, job["status"], job["id"] + ".json"), job)
+        os.remove(os.path.join(queue_dir, "running", job["id"] + ".json"))
+        jobs_run += 1
+        print(
+            "Job %s %s: %s"
+            % (
+                job["id"],
+                job["status"],
+                ", ".join("%s %.2fs" % item for item in job["latency"].items()),
+            )
+        )
+
+
+if __name__ == "__main__":
+    # Blender passes the arguments after '--' on to the script
+    argv = sys.argv[sys.argv.index("--") + 1 :] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(description="Run Blender jobs from a queue")
+    parser.add_argument("--queue", help="Queue directory", type=str, required=True)
+    parser.add_argument(
+        "--poll", help="Poll interval (s)", type=float, required=False, default=0.1
+    )
+    parser.add_argument(
+        "--max_jobs", help="Stop after this many jobs", type=int, default=None
+    )
+    args = parser.parse_args(argv)
+    serve(args.queue, poll_interval=args.poll, max_jobs=args.max_jobs)
@@ -0,0 +1,146 @@
+import unittest
+import os
+import sys
+import json
+import socket
+import tempfile
+import subprocess
+import bpy
+import numpy as np
+
+from library.worker import (
+    submit_job,
+    wait_for_job,
+    serve,
+    recover_jobs,
+    reset_scene,
+)
+from library.constructors.images import (
+    make_image_from_numpy,
+    load_image,
+    set_image_caching,
+)
+
+SCRIPT = """
+import bpy
+bpy.ops.mesh.primitive_plane_add(size=job_params["size"])
+bpy.context.scene["objects_at_end"] = len(bpy.data.objects)
+"""
+
+
+class TestWorker(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.queue = os.path.join(self.directory.name, "queue")
+        self.script = os.path.join(self.directory.name, "script.py")
+        with open(self.script, "w") as f:
+            f.write(SCRIPT)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_run_jobs(self):
+        """
+        Test that jobs run in order, each in a fresh scene, with their parameters.
+        """
+        first = submit_job(self.queue, self.script, {"size": 2})
+        second = submit_job(self.queue, self.script, {"size": 3})
+        serve(self.queue, poll_interval=0.01, max_jobs=2)
+        for job_id in (first, second):
+            job = wait_for_job(self.queue, job_id, timeout=1)
+            self.assertEqual(job["status"], "done")
+            self.assertGreaterEqual(job["latency"]["total"], job["latency"]["run"])
+        # The scene was reset, so only the second job's plane is left
+        self.assertEqual(bpy.context.scene["objects_at_end"], 1)
+        self.assertEqual(os.listdir(os.path.join(self.queue, "running")), [])
+
+    def test_failed_job(self):
+        """
+        Test that a failing script is reported, and doesn't stop the worker.
+        """
+        job_id = submit_job(self.queue, self.script, {})
+        serve(self.queue, poll_interval=0.01, max_jobs=1)
+        job = wait_for_job(self.queue, job_id, timeout=1)
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("KeyError", job["error"])
+
+    def test_wait_timeout(self):
+        """
+        Test that waiting for a job that never runs times out.
+        """
+        job_id = submit_job(self.queue, self.script, {"size": 1})
+        with self.assertRaises(TimeoutError):
+            wait_for_job(self.queue, job_id, timeout=0.05, poll_interval=0.01)
+
+    def test_recover_jobs(self):
+        """
+        Test that a job left running by a stopped worker is failed, not left forever.
+        """
+        stopped = subprocess.Popen([sys.executable, "-c", "pass"])
+        stopped.wait()
+        jobs = {}
+        for pid in (stopped.pid, os.getpid()):
+            job_id = submit_job(self.queue, self.script, {"size": 1})
+            os.rename(
+                os.path.join(self.queue, "incoming", job_id + ".json"),
+                os.path.join(self.queue, "running", job_id + ".json"),
+            )
+            with open(os.path.join(self.queue, "running", job_id + ".json")) as f:
+                job = json.load(f)
+            job["worker"] = {"host": socket.gethostname(), "pid": pid}
+            with open(os.path.join(self.queue, "running", job_id + ".json"), "w") as f:
+                json.dump(job, f)
+            jobs[pid] = job_id
+        self.assertEqual(recover_jobs(self.queue), [jobs[stopped.pid]])
+        job = wait_for_job(self.queue, jobs[stopped.pid], timeout=1)
+        self.assertEqual(job["status"], "failed")
+        # The job of a running worker is left alone
+        self.assertEqual(
+            os.listdir(os.path.join(self.queue, "running")),
+            [jobs[os.getpid()] + ".json"],
+        )
+
+    def test_exit_job(self):
+        """
+        Test that a script calling sys.exit() fails its job, not the worker.
+        """
+        with open(self.script, "w") as f:
+            f.write("import sys\nsys.exit(1)\n")
+        job_id = submit_job(self.queue, self.script, {})
+        serve(self.queue, poll_interval=0.01, max_jobs=1)
+        job = wait_for_job(self.queue, job_id, timeout=1)
+        self.assertEqual(job["status"], "failed")
+        self.assertIn("SystemExit", job["error"])
+
+    def test_reset_keeps_images(self):
+        """
+        Test that resetting the scene keeps the images kept by load_image only.
+        """
+        path = os.path.join(self.directory.name, "test.png")
+        img = make_image_from_numpy(np.random.rand(4, 4, 4), name="saved")
+        img.filepath_raw = path
+        img.file_format = "PNG"
+        img.save()
+        set_image_caching(True)
+        try:
+            kept = load_image(path)
+            bpy.ops.mesh.primitive_plane_add()
+            bpy.context.scene["job_property"] = 1
+            reset_scene()
+            self.assertEqual(len(bpy.data.objects), 0)
+            self.assertNotIn("job_property", bpy.context.scene)
+            self.assertEqual(list(bpy.data.images), [kept])
+            self.assertEqual(load_image(path), kept)
+        finally:
+            set_image_caching(False)
+
+    def test_worker_recorded(self):
+        job_id = submit_job(self.queue, self.script, {"size": 1})
+        serve(self.queue, poll_interval=0.01, max_jobs=1)
+        job = wait_for_job(self.queue, job_id, timeout=1)
+        self.assertEqual(job["worker"]["pid"], os.getpid())
+        self.assertIn("after", job["memory"])
+
+
+if __name__ == "__main__":
+    unittest.main()